@@ -11,10 +11,13 @@ from src.routes.user import user_bp
 from src.routes.log import log_bp
 from src.routes.parser import parser_bp
 from src.routes.analysis import analysis_bp
+from src.json_provider import ORJSONProvider, orjson
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
+if orjson is not None:
+    app.json = ORJSONProvider(app)
 
 # Enable CORS for all routes
 CORS(app)
@@ -30,6 +33,10 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    # create_all skips tables that already exist, so add newer indexes to them
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -1,3 +1,4 @@
+from flask import g
 from src.models.user import db
 from datetime import datetime
 import os
@@ -19,9 +20,31 @@ class LogFile(db.Model):
     
     @property
     def entry_count(self):
-        return len(self.entries)
+        # COUNT in SQL rather than loading every entry just to take len()
+        return db.session.query(db.func.count(LogEntry.id))\
+                         .filter(LogEntry.log_file_id == self.id).scalar()
+    
+    @property
+    def etag(self):
+        """Version tag that changes whenever the file's rendered fields can"""
+        uploaded = int(self.upload_time.timestamp()) if self.upload_time else 0
+        return f"{self.id}-{self.file_size}-{uploaded}-{int(bool(self.processed))}-{self.log_type}"
     
     def to_dict(self):
+        # Memoized per instance so repeated calls skip the entry COUNT; keyed on
+        # etag so processing the file or changing its format refreshes it
+        etag = self.etag
+        cached = getattr(self, '_cached_dict', None)
+        if cached is not None and cached[0] == etag:
+            return cached[1]
+        
+        data = self.meta_dict()
+        data['entry_count'] = self.entry_count
+        self._cached_dict = (etag, data)
+        return data
+    
+    def meta_dict(self):
+        """to_dict without entry_count, for paths that must not run the COUNT"""
         return {
             'id': self.id,
             'filename': self.filename,
@@ -29,12 +52,24 @@ class LogFile(db.Model):
             'file_size': self.file_size,
             'log_type': self.log_type,
             'upload_time': self.upload_time.isoformat() if self.upload_time else None,
-            'processed': self.processed,
-            'entry_count': self.entry_count
+            'processed': self.processed
         }
 
+def get_log_file(file_id):
+    """LogFile for file_id (or 404), looked up at most once per request"""
+    cache = g.setdefault('log_file_cache', {})
+    log_file = cache.get(file_id)
+    if log_file is None:
+        log_file = cache[file_id] = LogFile.query.get_or_404(file_id)
+    return log_file
+
 class LogEntry(db.Model):
     __tablename__ = 'log_entries'
+    __table_args__ = (
+        db.Index('ix_entries_file_line', 'log_file_id', 'line_number'),
+        db.Index('ix_entries_file_level', 'log_file_id', 'level'),
+        db.Index('ix_entries_file_ts', 'log_file_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     log_file_id = db.Column(db.Integer, db.ForeignKey('log_files.id'), nullable=False)
@@ -45,19 +80,49 @@ class LogEntry(db.Model):
     message = db.Column(db.Text, nullable=False)
     raw_line = db.Column(db.Text, nullable=False)
     
-    def to_dict(self):
+    @classmethod
+    def bulk_insert(cls, log_file_id, parsed_entries, batch_size=1000):
+        """Insert parsed entries with Core executemany batches, skipping the ORM"""
+        rows = [{
+            'log_file_id': log_file_id,
+            'line_number': entry.line_number,
+            'timestamp': entry.timestamp,
+            'level': entry.level,
+            'source': entry.source,
+            'message': entry.message,
+            'raw_line': entry.raw_line
+        } for entry in parsed_entries]
+        
+        for i in range(0, len(rows), batch_size):
+            db.session.execute(cls.__table__.insert(), rows[i:i + batch_size])
+    
+    @classmethod
+    def dict_columns(cls):
+        """Columns rendered by to_dict, for queries that skip ORM hydration"""
+        return (cls.id, cls.line_number, cls.timestamp, cls.level,
+                cls.source, cls.message, cls.raw_line)
+    
+    @staticmethod
+    def row_to_dict(row):
+        """Render an entry or a dict_columns() row"""
         return {
-            'id': self.id,
-            'line_number': self.line_number,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'level': self.level,
-            'source': self.source,
-            'message': self.message,
-            'raw_line': self.raw_line
+            'id': row.id,
+            'line_number': row.line_number,
+            'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+            'level': row.level,
+            'source': row.source,
+            'message': row.message,
+            'raw_line': row.raw_line
         }
+    
+    def to_dict(self):
+        return self.row_to_dict(self)
 
 class AnalysisResult(db.Model):
     __tablename__ = 'analysis_results'
+    __table_args__ = (
+        db.Index('ix_analysis_file_created', 'log_file_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     log_file_id = db.Column(db.Integer, db.ForeignKey('log_files.id'), nullable=False)
@@ -1,9 +1,88 @@
+import io
+import mmap
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from dateutil import parser as date_parser
+from itertools import chain, islice
+
+try:
+    import hyperscan
+except ImportError:  # Optional: detect_log_format falls back to per-check Python scans
+    hyperscan = None
+
+try:
+    import re2
+except ImportError:  # Optional: highlights then run every applicable pattern
+    re2 = None
+
+# Read buffer used when streaming log files from disk
+STREAM_BUFFER_SIZE = 64 * 1024
+
+# Inputs with at least this many lines are parsed in a process pool
+PARALLEL_MIN_LINES = 10_000
+PARALLEL_CHUNK_LINES = 5_000
+
+# Files on disk of at least this size are split into byte ranges per worker
+PARALLEL_MIN_BYTES = 1024 * 1024
+PARALLEL_MAX_WORKERS = 8
+
+# Below this length running the highlight patterns beats an RE2 set pre-scan
+RE2_MIN_LINE_LENGTH = 80
+
+# Level groups for highlight types
+_ERROR_LEVELS = frozenset({'ERROR', 'FATAL', 'CRITICAL'})
+_WARNING_LEVELS = frozenset({'WARN', 'WARNING'})
+_DEBUG_LEVELS = frozenset({'DEBUG', 'TRACE'})
+
+# Highlight patterns shared by every parser instance
+_ip_re = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+_url_re = re.compile(r'https?://[^\s]+')
+_path_re = re.compile(r'/\S*\.[a-zA-Z0-9]+')
+_num_re = re.compile(r'\b\d+(?:\.\d+)?\b')
+_quote_re = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')  # honours \" escapes
+
+# Format detection signatures
+_syslog_ts_re = re.compile(r'[A-Za-z]{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}')
+_dmesg_ts_re = re.compile(r'\[\s*\d+\.\d+\]')
+_iso_t_ts_re = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}')
+_iso_space_ts_re = re.compile(r'\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}')
+_dotted_quad_re = re.compile(r'\d+\.\d+\.\d+\.\d+')
+_apache_line_re = re.compile(r'\[[^\]]*\][^"]*"[^"]*"')
+
+# Case-insensitive marker terms for format detection
+_K8S_TERMS = ('pod/', 'namespace/', 'kubectl', 'kubelet')
+_MYSQL_TERMS = ('mysql', 'innodb', 'query', 'connection')
+_NGINX_TERMS = ('nginx', 'access.log', 'error.log')
+_APACHE_TERMS = ('apache', 'httpd')
+_DOCKER_TERMS = ('docker', 'container')
+
+# (format, score, regexes, terms) for the hyperscan path; a line earns each
+# signature's score once if any of its patterns match, like the Python checks
+_FORMAT_SIGNATURES = [
+    ('syslog', 2, [_syslog_ts_re.pattern], []),
+    ('dmesg', 3, [_dmesg_ts_re.pattern], ['kernel:']),
+    ('kubernetes', 2, [_iso_t_ts_re.pattern], []),
+    ('kubernetes', 2, [], _K8S_TERMS),
+    ('mysql', 1, [_iso_space_ts_re.pattern], []),
+    ('mysql', 2, [], _MYSQL_TERMS),
+    ('nginx', 3, [], _NGINX_TERMS),
+    ('nginx', 1, [_dotted_quad_re.pattern], []),
+    ('apache', 3, [], _APACHE_TERMS),
+    ('apache', 2, [_apache_line_re.pattern], []),
+    ('docker', 3, [], _DOCKER_TERMS),
+]
+
+def _collect_signature_hit(sig_id, start, end, flags, hits):
+    hits.add(sig_id)
 
 class LogEntry:
+    # One instance per parsed line, so skip the per-instance __dict__
+    __slots__ = ('line_number', 'raw_line', 'timestamp', 'level', 'source', 'message', 'highlights')
+    
     def __init__(self, line_number: int, raw_line: str):
         self.line_number = line_number
         self.raw_line = raw_line.strip()
@@ -11,7 +90,13 @@ class LogEntry:
         self.level = None
         self.source = None
         self.message = ""
-        self.highlights = []  # List of (start, end, type) tuples for highlighting
+        self.highlights = None  # List of (start, end, type) tuples, filled by get_highlights
+    
+    def get_highlights(self, parser: 'LogParser') -> List[Tuple[int, int, str]]:
+        """Compute highlights on first use and cache them on the entry"""
+        if self.highlights is None:
+            self.highlights = parser.generate_highlights(self)
+        return self.highlights
         
     def to_dict(self):
         return {
@@ -27,6 +112,9 @@ class LogEntry:
 class LogParser:
     def __init__(self):
         self.log_levels = ['TRACE', 'DEBUG', 'INFO', 'WARN', 'WARNING', 'ERROR', 'FATAL', 'CRITICAL']
+        # Lets detection reuse its lowercased line instead of making an uppercase copy
+        self._log_levels_lower = [level.lower() for level in self.log_levels]
+        self._log_levels_set = frozenset(self.log_levels)
         
         # Common timestamp patterns
         self.timestamp_patterns = [
@@ -55,6 +143,75 @@ class LogParser:
             r'<([^>]+)>',     # <component>
             r'(\w+):',        # component:
         ]
+        
+        # Compiled once so the per-line paths skip the re module cache lookup
+        self._ts_res = [re.compile(p) for p in self.timestamp_patterns]
+        self._level_res = [re.compile(p, re.IGNORECASE) for p in self.level_patterns]
+        
+        # Single-scan unions; every branch carries exactly one capture group
+        self._ts_union = re.compile('|'.join(f'(?:{p})' for p in self.timestamp_patterns))
+        self._level_union = re.compile('|'.join(f'(?:{p})' for p in self.level_patterns), re.IGNORECASE)
+        # Sources are tried in priority order, so each pattern gets its own
+        # optional lookahead capturing its first hit rather than a leftmost-wins union
+        self._source_union = re.compile(''.join(f'(?:(?=.*?{p}))?' for p in self.source_patterns), re.DOTALL)
+        
+        # Exact parser for each timestamp pattern, in the same order
+        self._ts_parsers = [
+            datetime.fromisoformat,                                   # ISO
+            self._parse_syslog_timestamp,                             # Syslog
+            lambda value: datetime.strptime(value, '%d/%b/%Y:%H:%M:%S %z'),  # Apache
+            datetime.fromisoformat,                                   # Kubernetes
+            datetime.fromisoformat,                                   # MySQL
+        ]
+        
+        # One-pass multi-pattern database for detect_log_format, when available
+        self._signatures = _FORMAT_SIGNATURES + [('application', 1, [], self.log_levels)]
+        self._signature_db = self._compile_signature_db(self._signatures) if hyperscan else None
+        
+        # Marker terms per format; detection scans about ten lines, where plain
+        # substring tests beat building and walking an automaton
+        self._term_groups = [
+            ('kubernetes', _K8S_TERMS),
+            ('mysql', _MYSQL_TERMS),
+            ('nginx', _NGINX_TERMS),
+            ('apache', _APACHE_TERMS),
+            ('docker', _DOCKER_TERMS),
+            ('application', self._log_levels_lower),
+        ]
+        
+        # RE2 set over every highlight pattern, telling which occur in a line
+        self._highlight_set = None
+        if re2:
+            self._highlight_set_res = (self._ts_res + self._level_res +
+                                       [_ip_re, _url_re, _path_re, _num_re, _quote_re])
+            self._highlight_set = re2.Set.SearchSet(re2.Options())
+            for rx in self._highlight_set_res:
+                flags = '(?i)' if rx.flags & re.IGNORECASE else ''
+                self._highlight_set.Add(flags + rx.pattern)
+            self._highlight_set.Compile()
+
+    @staticmethod
+    def _compile_signature_db(signatures):
+        """Compile detection signatures into a hyperscan block-mode database"""
+        expressions, ids, flags = [], [], []
+        for sig_id, (_, _, regexes, terms) in enumerate(signatures):
+            for pattern in regexes:
+                expressions.append(pattern.encode())
+                ids.append(sig_id)
+                flags.append(hyperscan.HS_FLAG_SINGLEMATCH)
+            for term in terms:
+                expressions.append(re.escape(term).encode())
+                ids.append(sig_id)
+                flags.append(hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_CASELESS)
+        
+        database = hyperscan.Database()
+        database.compile(expressions=expressions, ids=ids, elements=len(expressions), flags=flags)
+        return database
+
+    @staticmethod
+    def _parse_syslog_timestamp(value: str) -> datetime:
+        """Parse a syslog timestamp, which carries no year"""
+        return datetime.strptime(value, '%b %d %H:%M:%S').replace(year=datetime.now().year)
 
     def detect_log_format(self, lines: List[str]) -> str:
         """Detect the log format based on content analysis"""
@@ -72,144 +229,204 @@ class LogParser:
             'generic': 0
         }
         
+        if self._signature_db is not None:
+            self._score_formats_hyperscan(sample_lines, format_scores)
+        else:
+            self._score_formats(sample_lines, format_scores)
+        
+        # Return the format with the highest score
+        detected_format = max(format_scores, key=format_scores.get)
+        return detected_format if format_scores[detected_format] > 0 else 'generic'
+
+    def _score_formats_hyperscan(self, sample_lines: List[str], format_scores: Dict[str, int]):
+        """Score sample lines with a single hyperscan pass per line"""
+        # Scratch space is per call so a shared parser stays thread-safe
+        scratch = hyperscan.Scratch(self._signature_db)
+        for line in sample_lines:
+            hits = set()
+            self._signature_db.scan(line.encode(), match_event_handler=_collect_signature_hit,
+                                    context=hits, scratch=scratch)
+            for sig_id in hits:
+                detected, score = self._signatures[sig_id][:2]
+                format_scores[detected] += score
+            format_scores['generic'] += 1
+
+    def _term_hits(self, line_lower: str) -> set:
+        """Formats whose marker terms occur in a lowercased line"""
+        return {detected for detected, terms in self._term_groups
+                if any(term in line_lower for term in terms)}
+
+    def _score_formats(self, sample_lines: List[str], format_scores: Dict[str, int]):
+        """Score sample lines with individual substring and regex checks"""
         for line in sample_lines:
             line_lower = line.lower()
+            term_hits = self._term_hits(line_lower)
+            # Every timestamp signature needs a ':', so one substring test gates them all
+            has_time = ':' in line
             
             # Syslog patterns
-            if re.search(r'[A-Za-z]{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}', line):
+            if has_time and _syslog_ts_re.search(line):
                 format_scores['syslog'] += 2
             
             # Dmesg patterns
-            if re.search(r'\[\s*\d+\.\d+\]', line) or 'kernel:' in line_lower:
+            if 'kernel:' in line_lower or ('[' in line and _dmesg_ts_re.search(line)):
                 format_scores['dmesg'] += 3
             
             # Kubernetes patterns
-            if re.search(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}', line):
+            if has_time and 'T' in line and _iso_t_ts_re.search(line):
                 format_scores['kubernetes'] += 2
-            if any(k8s_term in line_lower for k8s_term in ['pod/', 'namespace/', 'kubectl', 'kubelet']):
+            if 'kubernetes' in term_hits:
                 format_scores['kubernetes'] += 2
             
             # MySQL patterns
-            if re.search(r'\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}', line):
+            if has_time and '-' in line and _iso_space_ts_re.search(line):
                 format_scores['mysql'] += 1
-            if any(mysql_term in line_lower for mysql_term in ['mysql', 'innodb', 'query', 'connection']):
+            if 'mysql' in term_hits:
                 format_scores['mysql'] += 2
             
             # Nginx patterns
-            if any(nginx_term in line_lower for nginx_term in ['nginx', 'access.log', 'error.log']):
+            if 'nginx' in term_hits:
                 format_scores['nginx'] += 3
-            if re.search(r'\d+\.\d+\.\d+\.\d+', line):  # IP addresses
+            if '.' in line and _dotted_quad_re.search(line):  # IP addresses
                 format_scores['nginx'] += 1
             
             # Apache patterns
-            if any(apache_term in line_lower for apache_term in ['apache', 'httpd']):
+            if 'apache' in term_hits:
                 format_scores['apache'] += 3
-            if re.search(r'\[.*?\].*?".*?"', line):  # Apache log format
+            if '[' in line and '"' in line and _apache_line_re.search(line):  # Apache log format
                 format_scores['apache'] += 2
             
             # Docker patterns
-            if any(docker_term in line_lower for docker_term in ['docker', 'container']):
+            if 'docker' in term_hits:
                 format_scores['docker'] += 3
             
             # Application log patterns
-            if any(level in line.upper() for level in self.log_levels):
+            if 'application' in term_hits:
                 format_scores['application'] += 1
             
             # Generic fallback
             format_scores['generic'] += 1
-        
-        # Return the format with the highest score
-        detected_format = max(format_scores, key=format_scores.get)
-        return detected_format if format_scores[detected_format] > 0 else 'generic'
 
     def parse_timestamp(self, line: str) -> Optional[datetime]:
         """Extract timestamp from log line"""
-        for pattern in self.timestamp_patterns:
-            match = re.search(pattern, line)
-            if match:
-                timestamp_str = match.group(1)
-                try:
-                    # Try to parse with dateutil (handles many formats)
-                    return date_parser.parse(timestamp_str, fuzzy=True)
-                except:
-                    continue
-        return None
+        return self._match_timestamp(line)[0]
+
+    def _match_timestamp(self, line: str) -> Tuple[Optional[datetime], int, int]:
+        """Extract timestamp from log line along with the span it was found at"""
+        match = self._ts_union.search(line)
+        while match:
+            timestamp_str = match.group(match.lastindex)
+            start, end = match.span()
+            try:
+                return self._ts_parsers[match.lastindex - 1](timestamp_str), start, end
+            except ValueError:
+                pass
+            try:
+                # Fall back to dateutil (handles many formats)
+                return date_parser.parse(timestamp_str, fuzzy=True), start, end
+            except Exception:
+                pass
+            # Unparsable stamp, so a later one on the line may still do
+            match = self._ts_union.search(line, end)
+        return None, 0, 0
 
     def parse_level(self, line: str) -> Optional[str]:
         """Extract log level from log line"""
-        for pattern in self.level_patterns:
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                return match.group(1).upper()
-        return None
+        return self._match_level(line)[0]
+
+    def _match_level(self, line: str) -> Tuple[Optional[str], int, int]:
+        """Extract log level from log line along with the span it was found at"""
+        match = self._level_union.search(line)
+        if match:
+            # Interned so every entry with the same level shares one string
+            return sys.intern(match.group(match.lastindex).upper()), match.start(), match.end()
+        return None, 0, 0
 
     def parse_source(self, line: str) -> Optional[str]:
         """Extract source/component from log line"""
-        for pattern in self.source_patterns:
-            match = re.search(pattern, line)
-            if match:
-                source = match.group(1)
-                # Filter out common non-source patterns
-                if source not in self.log_levels and len(source) > 1:
-                    return source
+        for source in self._source_union.match(line).groups():
+            # Filter out common non-source patterns
+            if source and source not in self._log_levels_set and len(source) > 1:
+                return sys.intern(source)
         return None
 
     def generate_highlights(self, entry: LogEntry) -> List[Tuple[int, int, str]]:
         """Generate syntax highlighting information for a log entry"""
         highlights = []
+        add = highlights.append  # bound once; called for every match below
         line = entry.raw_line
         
+        # Searches are skipped when a character their pattern requires is absent,
+        # or, for long lines, when the RE2 set finds the pattern nowhere in the line.
+        # RE2's \d, \b and case folding are ASCII-only, so only ASCII lines are
+        # pre-scanned; others would lose full-width digits and non-ASCII levels
+        present = None
+        if (self._highlight_set is not None and len(line) >= RE2_MIN_LINE_LENGTH
+                and line.isascii()):
+            present = {self._highlight_set_res[i] for i in self._highlight_set.Match(line) or ()}
+        
         # Highlight timestamps
-        for pattern in self.timestamp_patterns:
-            for match in re.finditer(pattern, line):
-                highlights.append((match.start(), match.end(), 'timestamp'))
+        if ':' in line:
+            for rx in self._ts_res:
+                if present is not None and rx not in present:
+                    continue
+                for match in rx.finditer(line):
+                    add((match.start(), match.end(), 'timestamp'))
         
         # Highlight log levels
-        for pattern in self.level_patterns:
-            for match in re.finditer(pattern, line, re.IGNORECASE):
+        get_level_type = self.get_level_type
+        for rx in self._level_res:
+            if present is not None and rx not in present:
+                continue
+            for match in rx.finditer(line):
                 level = match.group(1).upper()
-                level_type = self.get_level_type(level)
-                highlights.append((match.start(), match.end(), level_type))
+                level_type = get_level_type(level)
+                add((match.start(), match.end(), level_type))
         
         # Highlight IP addresses
-        ip_pattern = r'\b(?:\d{1,3}\.){3}\d{1,3}\b'
-        for match in re.finditer(ip_pattern, line):
-            highlights.append((match.start(), match.end(), 'ip'))
+        if '.' in line and (present is None or _ip_re in present):
+            for match in _ip_re.finditer(line):
+                add((match.start(), match.end(), 'ip'))
         
         # Highlight URLs
-        url_pattern = r'https?://[^\s]+'
-        for match in re.finditer(url_pattern, line):
-            highlights.append((match.start(), match.end(), 'url'))
+        if '://' in line and (present is None or _url_re in present):
+            for match in _url_re.finditer(line):
+                add((match.start(), match.end(), 'url'))
         
         # Highlight file paths
-        path_pattern = r'(?:/[^\s]*)+\.[a-zA-Z0-9]+'
-        for match in re.finditer(path_pattern, line):
-            highlights.append((match.start(), match.end(), 'path'))
+        if '/' in line and (present is None or _path_re in present):
+            for match in _path_re.finditer(line):
+                add((match.start(), match.end(), 'path'))
         
         # Highlight numbers
-        number_pattern = r'\b\d+(?:\.\d+)?\b'
-        for match in re.finditer(number_pattern, line):
-            # Skip if already highlighted (e.g., in timestamp or IP)
-            if not any(h[0] <= match.start() < h[1] for h in highlights):
-                highlights.append((match.start(), match.end(), 'number'))
+        if present is None or _num_re in present:
+            covered = bytearray(len(line))
+            for start, end, _ in highlights:
+                covered[start:end] = b'\x01' * (end - start)
+            for match in _num_re.finditer(line):
+                # Skip if already highlighted (e.g., in timestamp or IP)
+                if not covered[match.start()]:
+                    add((match.start(), match.end(), 'number'))
         
         # Highlight quoted strings
-        quote_pattern = r'"[^"]*"'
-        for match in re.finditer(quote_pattern, line):
-            highlights.append((match.start(), match.end(), 'string'))
+        if '"' in line and (present is None or _quote_re in present):
+            for match in _quote_re.finditer(line):
+                add((match.start(), match.end(), 'string'))
         
+        # Ordered by start so consumers can merge spans in one pass
+        highlights.sort(key=lambda h: h[0])
         return highlights
 
     def get_level_type(self, level: str) -> str:
         """Get the highlight type for a log level"""
         level = level.upper()
-        if level in ['ERROR', 'FATAL', 'CRITICAL']:
+        if level in _ERROR_LEVELS:
             return 'error'
-        elif level in ['WARN', 'WARNING']:
+        elif level in _WARNING_LEVELS:
             return 'warning'
-        elif level in ['INFO']:
+        elif level == 'INFO':
             return 'info'
-        elif level in ['DEBUG', 'TRACE']:
+        elif level in _DEBUG_LEVELS:
             return 'debug'
         else:
             return 'level'
@@ -218,47 +435,157 @@ class LogParser:
         """Parse a single log line"""
         entry = LogEntry(line_number, raw_line)
         
-        # Extract timestamp
-        entry.timestamp = self.parse_timestamp(raw_line)
-        
-        # Extract log level
-        entry.level = self.parse_level(raw_line)
+        # Extract timestamp and log level, keeping where each was found
+        entry.timestamp, ts_start, ts_end = self._match_timestamp(raw_line)
+        entry.level, level_start, level_end = self._match_level(raw_line)
         
         # Extract source/component
         entry.source = self.parse_source(raw_line)
         
-        # Extract message (everything after structured parts)
-        message = raw_line
+        # Extract message (everything after structured parts) by cutting
+        # the matched spans out; a syslog stamp can start inside the level
+        # word, so overlapping spans are merged before the cut
+        spans = []
         if entry.timestamp:
-            # Remove timestamp from message
-            for pattern in self.timestamp_patterns:
-                message = re.sub(pattern, '', message, count=1)
-        
+            spans.append((ts_start, ts_end))
         if entry.level:
-            # Remove level from message
-            for pattern in self.level_patterns:
-                message = re.sub(pattern, '', message, count=1, flags=re.IGNORECASE)
+            spans.append((level_start, level_end))
+        if len(spans) == 2 and spans[0][0] < spans[1][1] and spans[1][0] < spans[0][1]:
+            spans = [(min(spans[0][0], spans[1][0]), max(spans[0][1], spans[1][1]))]
+        message = raw_line
+        for start, end in sorted(spans, reverse=True):
+            message = message[:start] + message[end:]
         
         entry.message = message.strip()
         
-        # Generate highlights
-        entry.highlights = self.generate_highlights(entry)
-        
+        # Highlights are left for get_highlights, as most entries are never rendered
         return entry
 
     def parse_logs(self, content: str, log_format: str = None) -> Tuple[List[LogEntry], str]:
         """Parse log content and return structured entries"""
-        lines = content.split('\n')
+        return self.parse_logs_stream(io.StringIO(content), log_format)
+
+    def parse_logs_stream(self, fileobj, log_format: str = None) -> Tuple[List[LogEntry], str]:
+        """Parse log lines from a text file-like object without reading it whole"""
+        lines = enumerate(fileobj, 1)
         
-        # Detect format if not provided
+        # Detect format if not provided, buffering only the head of the stream
+        head = []
         if not log_format:
-            log_format = self.detect_log_format(lines)
+            sample = []
+            for i, line in lines:
+                head.append((i, line))
+                if line.strip():
+                    sample.append(line)
+                    if len(sample) == 10:
+                        break
+            log_format = self.detect_log_format(sample)
+        
+        numbered = chain(head, lines)
+        
+        # Small inputs are parsed inline since pool start-up would dominate
+        first = list(islice(numbered, PARALLEL_MIN_LINES))
+        workers = min(_usable_cpu_count(), PARALLEL_MAX_WORKERS)
+        if len(first) < PARALLEL_MIN_LINES or workers < 2:
+            return self._parse_numbered_lines(chain(first, numbered), log_format), log_format
         
         entries = []
-        for i, line in enumerate(lines, 1):
-            if line.strip():  # Skip empty lines
-                entry = self.parse_line(i, line, log_format)
-                entries.append(entry)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_entries in pool.map(_parse_chunk, _iter_chunks(chain(first, numbered), log_format)):
+                entries.extend(chunk_entries)
+        
+        return entries, log_format
+
+    def parse_file(self, path: str, log_format: str = None) -> Tuple[List[LogEntry], str]:
+        """Parse a log file on disk, letting each worker read its own byte range"""
+        workers = min(_usable_cpu_count(), PARALLEL_MAX_WORKERS)
+        size = os.path.getsize(path)
+        if size < PARALLEL_MIN_BYTES or workers < 2:
+            return self.parse_logs_stream(iter_mapped_lines(path), log_format)
+        
+        if not log_format:
+            sample = islice((line for line in iter_mapped_lines(path) if line.strip()), 10)
+            log_format = self.detect_log_format(list(sample))
+        
+        jobs = [(path, start, end, log_format) for start, end in _split_file(path, size, workers)]
+        entries = []
+        lines_before = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for span_entries, span_lines in pool.map(_parse_file_span, jobs):
+                # Workers number their lines from 1; shift to file line numbers
+                for entry in span_entries:
+                    entry.line_number += lines_before
+                entries.extend(span_entries)
+                lines_before += span_lines
         
         return entries, log_format
 
+    def _parse_numbered_lines(self, numbered_lines, log_format: str) -> List[LogEntry]:
+        """Parse (line_number, line) pairs, skipping empty lines"""
+        # Method lookups hoisted out of the per-line loop
+        entries = []
+        parse_line = self.parse_line
+        append = entries.append
+        for i, line in numbered_lines:
+            if line.strip():  # Skip empty lines
+                append(parse_line(i, line, log_format))
+        
+        return entries
+
+
+def _usable_cpu_count() -> int:
+    """CPUs this process may run on, which can be fewer than the machine has"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on every platform
+        return os.cpu_count() or 1
+
+def _iter_chunks(numbered_lines, log_format: str):
+    """Group (line_number, line) pairs into pickle-friendly pool jobs"""
+    while True:
+        batch = list(islice(numbered_lines, PARALLEL_CHUNK_LINES))
+        if not batch:
+            return
+        yield batch[0][0], [line for _, line in batch], log_format
+
+def _parse_chunk(job) -> List[LogEntry]:
+    """Pool worker: parse consecutive lines numbered from start_lineno"""
+    start_lineno, lines, log_format = job
+    return default_parser._parse_numbered_lines(enumerate(lines, start_lineno), log_format)
+
+def _split_file(path: str, size: int, parts: int) -> List[Tuple[int, int]]:
+    """Split a file into about equal byte ranges that each end on a newline"""
+    bounds = [0]
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for k in range(1, parts):
+            newline = mm.find(b'\n', max(bounds[-1], size * k // parts))
+            if newline == -1:
+                break
+            bounds.append(newline + 1)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+def _parse_file_span(job) -> Tuple[List[LogEntry], int]:
+    """Pool worker: parse one byte range of a file, returning its entries and line count"""
+    path, start, end, log_format = job
+    lines = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        mm.seek(start)
+        readline = mm.readline
+        while mm.tell() < end:
+            lines.append(readline().decode('utf-8', 'ignore'))
+    return default_parser._parse_numbered_lines(enumerate(lines, 1), log_format), len(lines)
+
+def iter_mapped_lines(path: str, encoding: str = 'utf-8'):
+    """Yield the decoded lines of a file through a read-only memory map"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:  # empty files cannot be mapped
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b''):
+                yield line.decode(encoding, 'ignore')
+
+
+# Shared instance: LogParser holds only compiled patterns, which are safe to
+# use from several threads, so callers need not build their own
+default_parser = LogParser()
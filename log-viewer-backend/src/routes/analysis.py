@@ -1,10 +1,18 @@
-from flask import Blueprint, request, jsonify
-from src.models.log import db, LogFile, LogEntry, AnalysisResult
-from src.services.ai_analyzer import AIAnalyzer
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from src.models.log import db, LogFile, LogEntry, AnalysisResult, get_log_file
+from src.services.ai_analyzer import default_analyzer
+from src.services.analysis_jobs import analysis_jobs
+import io
 import os
 
 analysis_bp = Blueprint('analysis', __name__)
 
+# Seconds between keep-alive comments on a job's event stream
+JOB_EVENTS_KEEPALIVE = 15
+
+# Read once at startup; the setup instructions ask for a restart after changing it
+_API_KEY = os.getenv('DEEPSEEK_API_KEY')
+
 @analysis_bp.route('/analyze', methods=['POST'])
 def analyze_text():
     try:
@@ -17,7 +25,7 @@ def analyze_text():
             return jsonify({'error': 'No text provided for analysis'}), 400
         
         # Check if DeepSeek API key is configured
-        if not os.getenv('DEEPSEEK_API_KEY'):
+        if not _API_KEY:
             return jsonify({
                 'error': 'DeepSeek API key not configured. Please set DEEPSEEK_API_KEY environment variable.',
                 'demo_mode': True,
@@ -40,44 +48,69 @@ def analyze_text():
             }), 200
         
         # Get file context if file_id provided
-
+        context = _file_context(file_id)
         
-        # Get file context if file_id provided
-        context = {}
-        if file_id:
-            log_file = LogFile.query.get(file_id)
-            if log_file:
-                context = {
-                    'file_type': log_file.log_type,
-                    'file_name': log_file.original_filename,
-                    'total_lines': len(log_file.entries)
-                }
-        
-        # Initialize AI analyzer
-        analyzer = AIAnalyzer()
-        
-        # Perform analysis
-        if issue_description:
-            result = analyzer.analyze_specific_issue(text, issue_description)
-        else:
-            result = analyzer.analyze_logs(text, context)
-        
-        # Store analysis result in database
-        if result.get('success') and file_id:
-            analysis_record = AnalysisResult(
-                log_file_id=file_id,
-                selected_text=text[:1000],  # Store first 1000 chars
-                analysis=str(result.get('analysis', {}))  # Convert to string to match Text field
-            )
-            db.session.add(analysis_record)
-            db.session.commit()
+        # Optionally run the API call in the background; clients poll /status/<job_id>
+        # or subscribe to /status/<job_id>/events
+        if data.get('async'):
+            job_id = analysis_jobs.submit(current_app._get_current_object(), _run_text_analysis,
+                                          file_id, text, issue_description, context)
+            return jsonify({'job_id': job_id, 'state': 'PENDING'}), 202
         
+        result = _run_text_analysis(file_id, text, issue_description, context)
         return jsonify(result), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@analysis_bp.route('/analyze/stream', methods=['POST'])
+def analyze_text_stream():
+    """Stream a general analysis as server-sent events while it is generated"""
+    try:
+        data = request.get_json()
+        text = data.get('text', '')
+        file_id = data.get('file_id')
+        
+        if not text:
+            return jsonify({'error': 'No text provided for analysis'}), 400
+        
+        if not _API_KEY:
+            return jsonify({
+                'error': 'DeepSeek API key not configured. Please set DEEPSEEK_API_KEY environment variable.',
+                'demo_mode': True
+            }), 200
+        
+        context = _file_context(file_id)
+        dumps = current_app.json.dumps
+        
+        # Each event carries one JSON-encoded markdown fragment; the full text is
+        # recorded in the history once the model has finished
+        def generate():
+            parts = []
+            try:
+                for fragment in default_analyzer.analyze_logs_stream(text, context):
+                    parts.append(fragment)
+                    yield f"data: {dumps(fragment)}\n\n"
+            except Exception as e:
+                yield f"event: error\ndata: {dumps(str(e))}\n\n"
+                return
+            
+            if file_id:
+                db.session.add(AnalysisResult(
+                    log_file_id=file_id,
+                    selected_text=text[:1000],
+                    analysis=''.join(parts)
+                ))
+                db.session.commit()
+            yield "event: done\ndata: {}\n\n"
+        
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @analysis_bp.route('/agent-analyze', methods=['POST'])
 def agent_analyze():
     try:
@@ -91,7 +124,7 @@ def agent_analyze():
             return jsonify({'error': 'File ID and symptoms are required'}), 400
         
         # Get the log file and its entries
-        log_file = LogFile.query.get_or_404(file_id)
+        log_file = get_log_file(file_id)
         
         # Filter entries by time range if provided
         query = LogEntry.query.filter_by(log_file_id=file_id)
@@ -104,24 +137,29 @@ def agent_analyze():
             end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
             query = query.filter(LogEntry.timestamp <= end_dt)
         
-        entries = query.order_by(LogEntry.line_number).all()
-        
-
-        if not entries:
+        # Count in SQL so an empty range is rejected before any rows are loaded
+        total_entries = query.with_entities(db.func.count(LogEntry.id)).scalar()
+        if not total_entries:
             return jsonify({'error': 'No entries found in the specified time range'}), 404
-
-        # Combine all relevant log messages
-        all_log_text = "\n".join([f"{entry.timestamp} - {entry.level} - {entry.message}"
-                                 for entry in entries if entry.message.strip()])
         
-        if not all_log_text.strip():
-            return jsonify({'error': 'No log content found to analyze'}), 404
+        # Combine all relevant log messages, streaming only the needed columns
+        rows = (query.with_entities(LogEntry.timestamp, LogEntry.level, LogEntry.message)
+                .order_by(LogEntry.line_number)
+                .yield_per(1000))
+        buf = io.StringIO()
+        write = buf.write
+        separator = ""
+        for timestamp, level, message in rows:
+            if message.strip():
+                write(f"{separator}{timestamp} - {level} - {message}")
+                separator = "\n"
+        all_log_text = buf.getvalue()
         
         if not all_log_text.strip():
             return jsonify({'error': 'No log content found to analyze'}), 404
         
         # Check if DeepSeek API key is configured
-        if not os.getenv('DEEPSEEK_API_KEY'):
+        if not _API_KEY:
             return jsonify({
                 'error': 'DeepSeek API key not configured. Please set DEEPSEEK_API_KEY environment variable.',
                 'demo_mode': True,
@@ -148,56 +186,74 @@ def agent_analyze():
         context = {
             'file_type': log_file.log_type,
             'file_name': log_file.original_filename,
-            'total_entries': len(entries),
+            'total_entries': total_entries,
             'time_range': f"{start_time} to {end_time}" if start_time and end_time else "Not specified"
         }
         
-        # Initialize AI analyzer
-        analyzer = AIAnalyzer()
-        
-        # Perform agent analysis
-        result = analyzer.analyze_log_with_symptoms(all_log_text, symptoms, context)
-        
-        # Store analysis result in database
-        if result.get('success'):
-            analysis_record = AnalysisResult(
-                log_file_id=file_id,
-                selected_text=f"Agent Analysis - Symptoms: {symptoms}, Time Range: {start_time} to {end_time}",
-                analysis=str(result.get('analysis', {}))
-            )
-            db.session.add(analysis_record)
-            db.session.commit()
+        # Optionally run the API call in the background; clients poll /status/<job_id>
+        # or subscribe to /status/<job_id>/events
+        if data.get('async'):
+            job_id = analysis_jobs.submit(current_app._get_current_object(), _run_agent_analysis,
+                                          file_id, all_log_text, symptoms, start_time, end_time, context)
+            return jsonify({'job_id': job_id, 'state': 'PENDING'}), 202
         
+        result = _run_agent_analysis(file_id, all_log_text, symptoms, start_time, end_time, context)
         return jsonify(result), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@analysis_bp.route('/status/<job_id>', methods=['GET'])
+def get_analysis_status(job_id):
+    """Get the state of a background analysis job, with its result once finished"""
+    status = analysis_jobs.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(status), 200
+
+@analysis_bp.route('/status/<job_id>/events', methods=['GET'])
+def stream_analysis_status(job_id):
+    """Push a background analysis job's final state as a server-sent event"""
+    if analysis_jobs.status(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    dumps = current_app.json.dumps
+    
+    # Comment lines keep proxies from closing the connection while the job runs
+    def generate():
+        while True:
+            status = analysis_jobs.wait(job_id, JOB_EVENTS_KEEPALIVE)
+            if status is None:
+                yield f"event: error\ndata: {dumps('Job not found')}\n\n"
+                return
+            if status['state'] in ('SUCCESS', 'FAILURE'):
+                yield f"event: {status['state'].lower()}\ndata: {dumps(status)}\n\n"
+                return
+            yield ": keep-alive\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @analysis_bp.route('/suggestions/<int:file_id>', methods=['GET'])
 def get_analysis_suggestions(file_id):
     """Get AI analysis suggestions for a log file"""
     try:
-        log_file = LogFile.query.get_or_404(file_id)
+        log_file = get_log_file(file_id)
         
-        # Get sample of log entries
-        entries = LogEntry.query.filter_by(log_file_id=file_id).limit(50).all()
+        # Get sample of log entries, only the columns the heuristic reads
+        entries = LogEntry.query.filter_by(log_file_id=file_id)\
+                                .with_entities(LogEntry.level, LogEntry.source, LogEntry.message)\
+                                .order_by(LogEntry.line_number)\
+                                .limit(50).all()
         
         if not entries:
             return jsonify({'suggestions': ['No log entries found for analysis']}), 200
         
         # Convert entries to dict format
-        entry_dicts = []
-        for entry in entries:
-            entry_dicts.append({
-                'level': entry.level,
-                'source': entry.source,
-                'message': entry.message,
-                'timestamp': entry.timestamp.isoformat() if entry.timestamp else None
-            })
+        entry_dicts = [entry._asdict() for entry in entries]
         
         # Generate suggestions
-        analyzer = AIAnalyzer()
-        suggestions = analyzer.get_analysis_suggestions(entry_dicts)
+        suggestions = default_analyzer.get_analysis_suggestions(entry_dicts)
         
         return jsonify({
             'suggestions': suggestions,
@@ -212,20 +268,25 @@ def get_analysis_suggestions(file_id):
 def get_analysis_history(file_id):
     """Get analysis history for a log file"""
     try:
-        log_file = LogFile.query.get_or_404(file_id)
+        log_file = get_log_file(file_id)
         
         # Get analysis history
-        analyses = AnalysisResult.query.filter_by(log_file_id=file_id)\
-                                     .order_by(AnalysisResult.created_at.desc())\
-                                     .limit(10).all()
+        # Only fetch one character past each preview so long texts stay in the DB
+        analyses = db.session.query(AnalysisResult.id,
+                                    db.func.substr(AnalysisResult.selected_text, 1, 101),
+                                    db.func.substr(AnalysisResult.analysis, 1, 201),
+                                    AnalysisResult.created_at)\
+                             .filter(AnalysisResult.log_file_id == file_id)\
+                             .order_by(AnalysisResult.created_at.desc())\
+                             .limit(10).all()
         
         history = []
-        for analysis in analyses:
+        for analysis_id, selected_text, analysis, created_at in analyses:
             history.append({
-                'id': analysis.id,
-                'selected_text': analysis.selected_text[:100] + '...' if len(analysis.selected_text) > 100 else analysis.selected_text,
-                'analysis_summary': analysis.analysis[:200] + '...' if len(analysis.analysis) > 200 else analysis.analysis,
-                'created_at': analysis.created_at.isoformat(),
+                'id': analysis_id,
+                'selected_text': selected_text[:100] + '...' if len(selected_text) > 100 else selected_text,
+                'analysis_summary': analysis[:200] + '...' if len(analysis) > 200 else analysis,
+                'created_at': created_at.isoformat(),
             })
         
         return jsonify({
@@ -237,11 +298,61 @@ def get_analysis_history(file_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _file_context(file_id):
+    """Prompt context describing the file a selection came from, if any"""
+    if not file_id:
+        return {}
+    log_file = LogFile.query.get(file_id)
+    if not log_file:
+        return {}
+    return {
+        'file_type': log_file.log_type,
+        'file_name': log_file.original_filename,
+        'total_lines': log_file.entry_count
+    }
+
+def _run_text_analysis(file_id, text, issue_description, context):
+    """Run a text analysis and record it in the file's history"""
+    # Perform analysis; the analyzer answers repeated input from its caches
+    if issue_description:
+        result = default_analyzer.analyze_specific_issue(text, issue_description)
+    else:
+        result = default_analyzer.analyze_logs(text, context)
+    
+    # Store analysis result in database
+    if result.get('success') and file_id:
+        analysis_record = AnalysisResult(
+            log_file_id=file_id,
+            selected_text=text[:1000],  # Store first 1000 chars
+            analysis=str(result.get('analysis', {}))  # Convert to string to match Text field
+        )
+        db.session.add(analysis_record)
+        db.session.commit()
+    
+    return result
+
+def _run_agent_analysis(file_id, all_log_text, symptoms, start_time, end_time, context):
+    """Run an agent analysis and record it in the file's history"""
+    # Perform agent analysis; the analyzer answers repeated input from its caches
+    result = default_analyzer.analyze_log_with_symptoms(all_log_text, symptoms, context)
+    
+    # Store analysis result in database
+    if result.get('success'):
+        analysis_record = AnalysisResult(
+            log_file_id=file_id,
+            selected_text=f"Agent Analysis - Symptoms: {symptoms}, Time Range: {start_time} to {end_time}",
+            analysis=str(result.get('analysis', {}))
+        )
+        db.session.add(analysis_record)
+        db.session.commit()
+    
+    return result
+
 @analysis_bp.route('/config', methods=['GET'])
 def get_analysis_config():
     """Get AI analysis configuration status"""
     try:
-        has_api_key = bool(os.getenv('DEEPSEEK_API_KEY'))
+        has_api_key = bool(_API_KEY)
         
         return jsonify({
             'configured': has_api_key,
@@ -251,8 +362,11 @@ def get_analysis_config():
                 'general_analysis': True,
                 'specific_issue_analysis': True,
                 'analysis_suggestions': True,
-                'analysis_history': True
+                'analysis_history': True,
+                'background_jobs': True,
+                'streaming_analysis': True
             },
+            'cache': default_analyzer.cache_stats(),
             'setup_instructions': {
                 'step1': 'Get a DeepSeek API key from https://platform.deepseek.com/',
                 'step2': 'Set the DEEPSEEK_API_KEY environment variable',
@@ -0,0 +1,19 @@
+import hashlib
+from flask import request, make_response
+
+
+def etag_for(*parts) -> str:
+    """Short strong ETag for any repr-able values"""
+    return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+def with_etag(response, etag, cache_control='private, no-cache'):
+    """Attach the ETag; no-cache makes clients revalidate instead of reusing stale data"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def not_modified(etag, cache_control='private, no-cache'):
+    """A 304 response if the client already holds this ETag, otherwise None"""
+    if request.if_none_match.contains(etag):
+        return with_etag(make_response('', 304), etag, cache_control)
+    return None
@@ -1,18 +1,19 @@
 import os
 import uuid
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from werkzeug.utils import secure_filename
-from src.models.log import db, LogFile, LogEntry, AnalysisResult
+from src.models.log import db, LogFile, LogEntry, AnalysisResult, get_log_file
+from src.routes.caching import etag_for, with_etag, not_modified
 import mimetypes
 
 log_bp = Blueprint('log', __name__)
 
-ALLOWED_EXTENSIONS = {'log', 'txt', 'out', 'err', 'json'}
+ALLOWED_EXTENSIONS = frozenset({'log', 'txt', 'out', 'err', 'json'})
 UPLOAD_FOLDER = 'uploads'
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return os.path.splitext(filename)[1][1:].lower() in ALLOWED_EXTENSIONS
 
 def ensure_upload_folder():
     upload_path = os.path.join(current_app.root_path, UPLOAD_FOLDER)
@@ -20,35 +21,53 @@ def ensure_upload_folder():
         os.makedirs(upload_path)
     return upload_path
 
+def save_upload(file, file_path, sample_size=1000):
+    """Write an upload to disk in one pass, returning its first sample_size bytes"""
+    head = b''
+    with open(file_path, 'wb') as out:
+        for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+            if len(head) < sample_size:
+                head += chunk[:sample_size - len(head)]
+            out.write(chunk)
+    return head
+
+# (term, log type) pairs in priority order, matched against the lowercased text
+_FILENAME_LOG_TYPES = (
+    ('syslog', 'syslog'), ('messages', 'syslog'),
+    ('dmesg', 'dmesg'), ('kernel', 'dmesg'),
+    ('kubernetes', 'kubernetes'), ('k8s', 'kubernetes'), ('kubectl', 'kubernetes'),
+    ('mysql', 'mysql'), ('mariadb', 'mysql'),
+    ('nginx', 'nginx'),
+    ('apache', 'apache'), ('httpd', 'apache'),
+    ('docker', 'docker'),
+)
+_CONTENT_LOG_TYPES = (
+    ('level=info', 'structured'), ('level=error', 'structured'),
+    ('[info]', 'application'), ('[error]', 'application'),
+    ('kernel:', 'dmesg'),
+)
+
+def _match_log_type(terms, text):
+    """Log type of the highest-priority term found in text, or None"""
+    # For a 1000-character sample a handful of C-level substring searches beats
+    # both a multi-pattern automaton and a regex alternation
+    for term, log_type in terms:
+        if term in text:
+            return log_type
+    return None
+
 def detect_log_type(filename, content_sample):
     """Detect log type based on filename and content"""
-    filename_lower = filename.lower()
-    
     # Check filename patterns
-    if 'syslog' in filename_lower or 'messages' in filename_lower:
-        return 'syslog'
-    elif 'dmesg' in filename_lower or 'kernel' in filename_lower:
-        return 'dmesg'
-    elif 'kubernetes' in filename_lower or 'k8s' in filename_lower or 'kubectl' in filename_lower:
-        return 'kubernetes'
-    elif 'mysql' in filename_lower or 'mariadb' in filename_lower:
-        return 'mysql'
-    elif 'nginx' in filename_lower:
-        return 'nginx'
-    elif 'apache' in filename_lower or 'httpd' in filename_lower:
-        return 'apache'
-    elif 'docker' in filename_lower:
-        return 'docker'
+    log_type = _match_log_type(_FILENAME_LOG_TYPES, filename.lower())
+    if log_type:
+        return log_type
     
     # Check content patterns
     if content_sample:
-        content_lower = content_sample.lower()
-        if 'level=info' in content_lower or 'level=error' in content_lower:
-            return 'structured'
-        elif '[info]' in content_lower or '[error]' in content_lower:
-            return 'application'
-        elif 'kernel:' in content_lower:
-            return 'dmesg'
+        log_type = _match_log_type(_CONTENT_LOG_TYPES, content_sample.lower())
+        if log_type:
+            return log_type
     
     return 'generic'
 
@@ -71,69 +90,48 @@ def upload_file():
             upload_path = ensure_upload_folder()
             file_path = os.path.join(upload_path, unique_filename)
             
-            # Save file
-            file.save(file_path)
+            # Save file, keeping its first 1000 bytes for log type detection
+            head = save_upload(file, file_path)
             file_size = os.path.getsize(file_path)
-            
-            # Read sample content for log type detection
-            content_sample = ""
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content_sample = f.read(1000)  # Read first 1000 chars
-            except Exception:
-                pass
+            content_sample = head.decode('utf-8', 'ignore')
             
             # Detect log type
             log_type = detect_log_type(original_filename, content_sample)
             
+            # Parse the log content straight from the memory-mapped file
+            entries = None
+            detected_format = log_type
+            try:
+                from src.parsers.log_parser import default_parser
+                
+                entries, detected_format = default_parser.parse_file(file_path, log_type)
+            except Exception as parse_error:
+                # If parsing fails, still return success for upload
+                print(f"Parsing failed: {parse_error}")
+            
             # Create database record
             log_file = LogFile(
                 filename=unique_filename,
                 original_filename=original_filename,
                 file_path=file_path,
                 file_size=file_size,
-                log_type=log_type
+                log_type=detected_format
             )
             
             db.session.add(log_file)
-            db.session.commit()
+            db.session.flush()  # assigns log_file.id
             
-            # Automatically process the file
-            try:
-                from src.parsers.log_parser import LogParser
-                
-                # Read file content for processing
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    file_content = f.read()
-                
-                # Parse the log content
-                parser = LogParser()
-                entries, detected_format = parser.parse_logs(file_content, log_type)
-                
-                # Update log file with detected format
-                if detected_format != log_type:
-                    log_file.log_type = detected_format
-                
-                # Store parsed entries in database
-                for entry in entries:
-                    db_entry = LogEntry(
-                        log_file_id=log_file.id,
-                        line_number=entry.line_number,
-                        timestamp=entry.timestamp,
-                        level=entry.level,
-                        source=entry.source,
-                        message=entry.message,
-                        raw_line=entry.raw_line
-                    )
-                    db.session.add(db_entry)
-                
-                # Mark file as processed
-                log_file.processed = True
-                db.session.commit()
-                
-            except Exception as parse_error:
-                # If parsing fails, still return success for upload
-                print(f"Parsing failed: {parse_error}")
+            # Store parsed entries in the same transaction; a failed insert only
+            # rolls back to here, leaving the file recorded as unprocessed
+            if entries is not None:
+                try:
+                    with db.session.begin_nested():
+                        LogEntry.bulk_insert(log_file.id, entries)
+                        log_file.processed = True
+                except Exception as insert_error:
+                    print(f"Storing entries failed: {insert_error}")
+            
+            db.session.commit()
             
             return jsonify({
                 'message': 'File uploaded successfully',
@@ -149,61 +147,135 @@ def upload_file():
 def get_files():
     try:
         files = LogFile.query.order_by(LogFile.upload_time.desc()).all()
-        return jsonify({
+        
+        # An unchanged listing is answered before counting each file's entries
+        etag = etag_for([file.etag for file in files])
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        
+        return with_etag(jsonify({
             'files': [file.to_dict() for file in files]
-        }), 200
+        }), etag), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @log_bp.route('/files/<int:file_id>', methods=['GET'])
 def get_file(file_id):
     try:
-        log_file = LogFile.query.get_or_404(file_id)
-        return jsonify({
+        log_file = get_log_file(file_id)
+        
+        cached = not_modified(log_file.etag)
+        if cached is not None:
+            return cached
+        
+        return with_etag(jsonify({
             'file': log_file.to_dict()
-        }), 200
+        }), log_file.etag), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @log_bp.route('/files/<int:file_id>/content', methods=['GET'])
 def get_file_content(file_id):
     try:
-        log_file = LogFile.query.get_or_404(file_id)
+        from src.parsers.log_parser import STREAM_BUFFER_SIZE
+        
+        log_file = get_log_file(file_id)
+        file_path = log_file.file_path
+        as_text = request.args.get('format') == 'text'
+        
+        # Uploaded files are never rewritten, so the record's tag covers the
+        # content; each representation gets its own tag
+        etag = f"{log_file.etag}-text" if as_text else log_file.etag
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        
+        # Stream the file as plain text in chunks instead of one JSON body
+        if as_text:
+            def generate():
+                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    for chunk in iter(lambda: f.read(STREAM_BUFFER_SIZE), ''):
+                        yield chunk
+            
+            return with_etag(Response(stream_with_context(generate()), mimetype='text/plain',
+                                      headers={'X-Log-File-Id': str(log_file.id),
+                                               'X-Log-Type': log_file.log_type or ''}),
+                             etag), 200
         
         # Read file content
-        with open(log_file.file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
             content = f.read()
         
-        return jsonify({
+        return with_etag(jsonify({
             'content': content,
             'file': log_file.to_dict()
-        }), 200
+        }), etag), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @log_bp.route('/files/<int:file_id>/entries', methods=['GET'])
 def get_file_entries(file_id):
     try:
-        log_file = LogFile.query.get_or_404(file_id)
+        log_file = get_log_file(file_id)
+        
+        # Stream every entry as NDJSON, one object per line, without paging
+        if request.args.get('format') == 'ndjson':
+            query = LogEntry.query.filter_by(log_file_id=file_id)\
+                                  .with_entities(*LogEntry.dict_columns())\
+                                  .order_by(LogEntry.line_number)
+            dumps = current_app.json.dumps
+            
+            def generate():
+                for row in query.yield_per(500):
+                    yield dumps(LogEntry.row_to_dict(row)) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                            headers={'X-Log-File-Id': str(log_file.id),
+                                     'X-Log-Type': log_file.log_type or ''}), 200
         
         # Get pagination parameters
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 100, type=int)
+        after_line = request.args.get('after_line', type=int)
         
-        # Get entries with pagination
-        entries = LogEntry.query.filter_by(log_file_id=file_id)\
-                              .order_by(LogEntry.line_number)\
-                              .paginate(page=page, per_page=per_page, error_out=False)
+        query = LogEntry.query.filter_by(log_file_id=file_id)\
+                              .with_entities(*LogEntry.dict_columns())
+        
+        # Keyset pagination: seek past the last line seen, with no OFFSET or COUNT
+        if after_line is not None:
+            per_page = max(per_page, 1)
+            rows = query.filter(LogEntry.line_number > after_line)\
+                        .order_by(LogEntry.line_number)\
+                        .limit(per_page + 1).all()
+            has_more = len(rows) > per_page
+            rows = rows[:per_page]
+            
+            return jsonify({
+                'entries': [LogEntry.row_to_dict(row) for row in rows],
+                'pagination': {
+                    'after_line': after_line,
+                    'per_page': per_page,
+                    'next_after_line': rows[-1].line_number if has_more else None
+                },
+                'file': log_file.meta_dict()
+            }), 200
+        
+        # Get entries with pagination; the total is the file's entry count
+        file_info = log_file.to_dict()
+        entries = query.order_by(LogEntry.line_number)\
+                       .paginate(page=page, per_page=per_page, error_out=False, count=False)
+        total = file_info['entry_count']
         
         return jsonify({
-            'entries': [entry.to_dict() for entry in entries.items],
+            'entries': [LogEntry.row_to_dict(row) for row in entries.items],
             'pagination': {
                 'page': entries.page,
-                'pages': entries.pages,
+                'pages': -(-total // entries.per_page) if total and entries.per_page else 0,
                 'per_page': entries.per_page,
-                'total': entries.total
+                'total': total
             },
-            'file': log_file.to_dict()
+            'file': file_info
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -211,16 +283,21 @@ def get_file_entries(file_id):
 @log_bp.route('/files/<int:file_id>', methods=['DELETE'])
 def delete_file(file_id):
     try:
-        log_file = LogFile.query.get_or_404(file_id)
-        
-        # Delete physical file
-        if os.path.exists(log_file.file_path):
-            os.remove(log_file.file_path)
+        file_path = db.session.query(LogFile.file_path).filter_by(id=file_id).scalar()
+        if file_path is None:
+            return jsonify({'error': 'File not found'}), 404
         
-        # Delete database record (entries will be deleted by cascade)
-        db.session.delete(log_file)
+        # Delete database records with set-based DELETEs rather than loading
+        # every entry for the ORM cascade; analysis history goes with the file
+        db.session.execute(LogEntry.__table__.delete().where(LogEntry.log_file_id == file_id))
+        db.session.execute(AnalysisResult.__table__.delete().where(AnalysisResult.log_file_id == file_id))
+        db.session.execute(LogFile.__table__.delete().where(LogFile.id == file_id))
         db.session.commit()
         
+        # Delete physical file
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        
         return jsonify({'message': 'File deleted successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
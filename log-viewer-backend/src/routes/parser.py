@@ -1,25 +1,73 @@
 from flask import Blueprint, request, jsonify
-from src.models.log import db, LogFile, LogEntry
-from src.parsers.log_parser import LogParser
+from src.models.log import db, LogEntry, get_log_file
+from src.parsers.log_parser import default_parser
+from src.routes.caching import etag_for, with_etag, not_modified
 
 parser_bp = Blueprint('parser', __name__)
 
+SUPPORTED_FORMATS = {
+    'syslog': {
+        'name': 'Syslog',
+        'description': 'Standard system log format',
+        'example': 'Sep 23 22:40:00 server kernel: message'
+    },
+    'dmesg': {
+        'name': 'Kernel Messages',
+        'description': 'Linux kernel messages',
+        'example': '[12345.678] kernel: message'
+    },
+    'kubernetes': {
+        'name': 'Kubernetes',
+        'description': 'Kubernetes container logs',
+        'example': '2025-09-23T22:40:00.123Z INFO message'
+    },
+    'mysql': {
+        'name': 'MySQL',
+        'description': 'MySQL database logs',
+        'example': '2025-09-23 22:40:00 [Note] message'
+    },
+    'nginx': {
+        'name': 'Nginx',
+        'description': 'Nginx web server logs',
+        'example': '192.168.1.1 - - [23/Sep/2025:22:40:00 +0000] "GET / HTTP/1.1"'
+    },
+    'apache': {
+        'name': 'Apache',
+        'description': 'Apache web server logs',
+        'example': '192.168.1.1 - - [23/Sep/2025:22:40:00 +0000] "GET / HTTP/1.1"'
+    },
+    'docker': {
+        'name': 'Docker',
+        'description': 'Docker container logs',
+        'example': '2025-09-23T22:40:00.123456789Z container message'
+    },
+    'application': {
+        'name': 'Application',
+        'description': 'Generic application logs',
+        'example': '2025-09-23 22:40:00 INFO [component] message'
+    },
+    'generic': {
+        'name': 'Generic',
+        'description': 'Generic text logs',
+        'example': 'Any text-based log format'
+    }
+}
+
+# The format list only changes with a deploy, so clients may reuse it for an hour
+_FORMATS_ETAG = etag_for(sorted((name, sorted(info.items())) for name, info in SUPPORTED_FORMATS.items()))
+_FORMATS_CACHE_CONTROL = 'public, max-age=3600'
+
 @parser_bp.route('/process/<int:file_id>', methods=['POST'])
 def process_log_file(file_id):
     """Process a log file and extract structured entries"""
     try:
-        log_file = LogFile.query.get_or_404(file_id)
+        log_file = get_log_file(file_id)
         
         if log_file.processed:
             return jsonify({'message': 'File already processed'}), 200
         
-        # Read file content
-        with open(log_file.file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        # Parse the log content
-        parser = LogParser()
-        entries, detected_format = parser.parse_logs(content, log_file.log_type)
+        # Parse the log content straight from the memory-mapped file
+        entries, detected_format = default_parser.parse_file(log_file.file_path, log_file.log_type)
         
         # Update log file with detected format
         if detected_format != log_file.log_type:
@@ -29,17 +77,7 @@ def process_log_file(file_id):
         LogEntry.query.filter_by(log_file_id=file_id).delete()
         
         # Store parsed entries in database
-        for entry in entries:
-            db_entry = LogEntry(
-                log_file_id=file_id,
-                line_number=entry.line_number,
-                timestamp=entry.timestamp,
-                level=entry.level,
-                source=entry.source,
-                message=entry.message,
-                raw_line=entry.raw_line
-            )
-            db.session.add(db_entry)
+        LogEntry.bulk_insert(file_id, entries)
         
         # Mark file as processed
         log_file.processed = True
@@ -68,11 +106,12 @@ def parse_preview():
             return jsonify({'error': 'No content provided'}), 400
         
         # Parse the log content
-        parser = LogParser()
-        entries, detected_format = parser.parse_logs(content, log_format)
+        entries, detected_format = default_parser.parse_logs(content, log_format)
         
-        # Return first 50 entries for preview
+        # Return first 50 entries for preview, highlighting only those
         preview_entries = entries[:50]
+        for entry in preview_entries:
+            entry.get_highlights(default_parser)
         
         return jsonify({
             'entries': [entry.to_dict() for entry in preview_entries],
@@ -87,53 +126,8 @@ def parse_preview():
 @parser_bp.route('/formats', methods=['GET'])
 def get_supported_formats():
     """Get list of supported log formats"""
-    formats = {
-        'syslog': {
-            'name': 'Syslog',
-            'description': 'Standard system log format',
-            'example': 'Sep 23 22:40:00 server kernel: message'
-        },
-        'dmesg': {
-            'name': 'Kernel Messages',
-            'description': 'Linux kernel messages',
-            'example': '[12345.678] kernel: message'
-        },
-        'kubernetes': {
-            'name': 'Kubernetes',
-            'description': 'Kubernetes container logs',
-            'example': '2025-09-23T22:40:00.123Z INFO message'
-        },
-        'mysql': {
-            'name': 'MySQL',
-            'description': 'MySQL database logs',
-            'example': '2025-09-23 22:40:00 [Note] message'
-        },
-        'nginx': {
-            'name': 'Nginx',
-            'description': 'Nginx web server logs',
-            'example': '192.168.1.1 - - [23/Sep/2025:22:40:00 +0000] "GET / HTTP/1.1"'
-        },
-        'apache': {
-            'name': 'Apache',
-            'description': 'Apache web server logs',
-            'example': '192.168.1.1 - - [23/Sep/2025:22:40:00 +0000] "GET / HTTP/1.1"'
-        },
-        'docker': {
-            'name': 'Docker',
-            'description': 'Docker container logs',
-            'example': '2025-09-23T22:40:00.123456789Z container message'
-        },
-        'application': {
-            'name': 'Application',
-            'description': 'Generic application logs',
-            'example': '2025-09-23 22:40:00 INFO [component] message'
-        },
-        'generic': {
-            'name': 'Generic',
-            'description': 'Generic text logs',
-            'example': 'Any text-based log format'
-        }
-    }
+    cached = not_modified(_FORMATS_ETAG, _FORMATS_CACHE_CONTROL)
+    if cached is not None:
+        return cached
     
-    return jsonify({'formats': formats}), 200
-
+    return with_etag(jsonify({'formats': SUPPORTED_FORMATS}), _FORMATS_ETAG, _FORMATS_CACHE_CONTROL), 200
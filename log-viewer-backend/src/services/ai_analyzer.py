@@ -1,70 +1,133 @@
 import os
-import json
-from typing import Dict, List, Optional
-from openai import OpenAI
-from datetime import datetime
+import re
+import hashlib
+import asyncio
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+from datetime import datetime, timezone
+from src.services.ai_cache import AnalysisCache, make_cache_key
+
+try:
+    import h2  # noqa: F401
+except ImportError:  # Optional: HTTP/2 needs the h2 package (httpx[http2])
+    h2 = None
+
+try:
+    import tiktoken
+except ImportError:  # Optional: log text is then budgeted by character count
+    tiktoken = None
+
+# One keep-alive connection pool for every analyzer in the process, so API calls
+# reuse open TLS connections; openai's default timeouts are kept
+_HTTP_CLIENT = DefaultHttpxClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    http2=h2 is not None
+)
+
+# Tokens that differ between otherwise identical log windows: timestamps in the
+# formats the parser knows, dmesg uptimes, UUIDs and long hex ids (which need a
+# hex letter, so decimal ids and byte counts stay part of the message)
+_VOLATILE_RE = re.compile(
+    r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?'
+    r'|\b[A-Z][a-z]{2} +\d{1,2} \d{2}:\d{2}:\d{2}'
+    r'|\d{2}/[A-Z][a-z]{2}/\d{4}:\d{2}:\d{2}:\d{2}(?: [+-]\d{4})?'
+    r'|\[\s*\d+\.\d+\]'
+    r'|\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b'
+    r'|\b0x[0-9a-fA-F]+\b|\b(?=[0-9a-f]*[a-f])[0-9a-f]{12,}\b'
+)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Log levels counted as errors and warnings by the suggestion heuristic
+_ERROR_LEVELS = frozenset({'ERROR', 'FATAL', 'CRITICAL'})
+_WARNING_LEVELS = frozenset({'WARN', 'WARNING'})
+
+# Message keywords behind the issue-specific suggestions, in suggestion order
+_SUGGESTION_KEYWORDS = (
+    (('authentication', 'login', 'password', 'unauthorized', 'forbidden'),
+     "Investigate authentication and access control issues"),
+    (('connection', 'timeout', 'network', 'dns', 'socket'),
+     "Analyze network connectivity and communication issues"),
+    (('slow', 'timeout', 'memory', 'cpu', 'performance', 'latency'),
+     "Review performance and resource utilization issues"),
+)
+
+# Messages joined per keyword scan, so the scan can stop once it is settled
+_KEYWORD_SCAN_BLOCK = 1000
+
+def _keyword_scan_settled(hits: List[bool], slots: int) -> bool:
+    """Whether further matches could still change which categories fill the slots"""
+    found = 0
+    for hit in hits:
+        if found >= slots:
+            return True
+        if not hit:
+            return False
+        found += 1
+    return True
+
+def _now() -> str:
+    """Current time as an ISO 8601 string with an explicit UTC offset"""
+    return datetime.now(timezone.utc).isoformat()
+
+def _normalize_log_text(log_text: str) -> str:
+    """
+    Log text with volatile tokens masked, so near-identical windows compare equal
+    
+    >>> _normalize_log_text('2024-01-01 10:00:00 trace 3f2a9c0d1e4b order 123456789012 failed')
+    '<*> trace <*> order 123456789012 failed'
+    """
+    return _WHITESPACE_RE.sub(' ', _VOLATILE_RE.sub('<*>', log_text)).strip()
+
+# Input budgets for the log text of one request; longer text keeps its head
+# and tail. The symptom analysis gets most of the model's 64k context window
+MAX_LOG_TOKENS = 8000
+AGENT_MAX_LOG_TOKENS = 48000
+_CHARS_PER_TOKEN = 4  # rough ratio for log text when tiktoken is unavailable
+_TRUNCATION_MARKER = "\n...\n"
+
+@lru_cache(maxsize=1)
+def _token_encoding():
+    """The tokenizer used to measure prompts, or None without tiktoken"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        # The encoding file is downloaded on first use and may be unreachable
+        return None
+
+def _fit_log_text(log_text: str, max_tokens: int) -> Tuple[str, bool]:
+    """Log text cut to its head and tail within max_tokens, and whether it was cut"""
+    encoding = _token_encoding()
+    if encoding is None:
+        limit = max_tokens * _CHARS_PER_TOKEN
+        if len(log_text) <= limit:
+            return log_text, False
+        half = limit // 2
+        return log_text[:half] + _TRUNCATION_MARKER + log_text[-half:], True
+    
+    # A token covers at least one UTF-8 byte, so short text needs no encoding
+    if len(log_text) * 4 <= max_tokens:
+        return log_text, False
+    tokens = encoding.encode(log_text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return log_text, False
+    half = max(max_tokens // 2, 1)  # tokens[-0:] would be the whole text
+    return encoding.decode(tokens[:half]) + _TRUNCATION_MARKER + encoding.decode(tokens[-half:]), True
+
+# Section headers that separate the per-chunk answers of a batched analysis
+_CHUNK_HEADER_RE = re.compile(r'^##\s*Chunk\s+(\d+)\s*$', re.MULTILINE | re.IGNORECASE)
+
+# Output budget for a batched analysis: per chunk, and the model's ceiling
+BATCH_TOKENS_PER_CHUNK = 1500
+BATCH_MAX_TOKENS = 8000
 
 class AIAnalyzer:
-    def __init__(self):
-        # DeepSeek API configuration
-        self.client = OpenAI(
-            api_key=os.getenv('DEEPSEEK_API_KEY', 'sk-placeholder'),  # User should set this
-            base_url="https://api.deepseek.com/v1"
-        )
-        self.model = "deepseek-chat"
-        
-    def analyze_logs(self, log_text: str, context: Dict = None) -> Dict:
-        """
-        Analyze log text using DeepSeek AI and return insights
-        
-        Args:
-            log_text: The log text to analyze
-            context: Additional context like file type, timestamp range, etc.
-            
-        Returns:
-            Dictionary containing analysis results
-        """
-        try:
-            # Prepare the analysis prompt
-            system_prompt = self._get_system_prompt()
-            user_prompt = self._build_user_prompt(log_text, context)
-            
-            # Call DeepSeek API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=2000
-            )
-            
-            # Get the response - now it should be markdown text
-            analysis_text = response.choices[0].message.content
-            
-            return {
-                "success": True,
-                "analysis": analysis_text,  # Return the markdown text directly
-                "timestamp": datetime.utcnow().isoformat(),
-                "model": self.model,
-                "token_usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
-            }
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "timestamp": datetime.utcnow().isoformat()
-            }
-    
-    def _get_system_prompt(self) -> str:
-        """Get the system prompt for log analysis"""
-        return """You are a senior operations (运维) and development (研发) expert. Analyze the provided log text and return your analysis in Chinese in Markdown format. Focus only on useful information and avoid unnecessary output.
+    # System prompts are fixed byte-for-byte, so every request shares the same
+    # prefix and they are built once at import time
+    _SYSTEM_PROMPT = """You are a senior operations (运维) and development (研发) expert. Analyze the provided log text and return your analysis in Chinese in Markdown format. Focus only on useful information and avoid unnecessary output.
 
 When analyzing logs, focus on:
 1. Identifying errors, warnings, and critical issues
@@ -108,26 +171,364 @@ For each pattern detected:
 
 回答必须使用中文，并以Markdown格式返回，不要使用JSON格式。专注于可操作的见解，而不是仅仅描述日志中的内容。仅输出最有用的信息，格式要清晰美观。"""
 
+    _ISSUE_SYSTEM_PROMPT = """You are a senior operations (运维) and development (研发) expert. Analyze the provided logs to answer a specific question or investigate a particular issue. Provide a focused, actionable response in Chinese in Markdown format. Focus only on useful information and avoid unnecessary output. Do not return results in JSON format."""
+
+    _AGENT_SYSTEM_PROMPT = """You are a senior operations (运维) and development (研发) expert. Analyze the provided log text based on the user's described symptoms to find relevant information, errors, warnings, or patterns that might be related to the reported issue. Focus on actionable insights and avoid unnecessary output.
+
+When analyzing logs with known symptoms:
+
+1. Identify log entries that directly relate to the user's reported symptoms
+2. Look for errors, warnings, or anomalies that occurred around the same time
+3. Find patterns or recurring issues that might explain the problem
+4. Correlate different log entries that might be related
+5. Identify potential root causes based on the log evidence
+6. Provide concrete recommendations for addressing the issue
+7. Highlight the most critical information that needs attention
+
+Provide your analysis in Chinese Markdown format with the following structure:
+# 问题分析
+[Provide a focused overview of the log analysis related to the user's symptoms]
+
+## 相关日志条目
+List the most relevant log entries found:
+- [Timestamp] - [Level] - [Message excerpt]
+- [Include multiple relevant entries]
+
+## 识别的问题
+For each issue found:
+### [Issue Type]
+- **描述**: [Issue description related to symptoms]
+- **严重程度**: [critical|high|medium|low]
+- **时间**: [When it occurred - specific timestamp if available]
+- **建议**: [Specific action to take]
+
+## 根本原因分析
+[Analyze potential root causes based on the log evidence]
+
+## 建议措施
+- [Specific actionable recommendation 1]
+- [Specific actionable recommendation 2]
+- [Specific actionable recommendation 3]
+
+## 时间线
+[If applicable, present a timeline of events related to the issue]
+
+## 关键指标
+- **相关错误数量**: [Number of errors related to symptoms]
+- **相关警告数量**: [Number of warnings related to symptoms]
+- **时间范围**: [Description of time range analyzed]
+
+回答必须使用中文，并以Markdown格式返回，不要使用JSON格式。专注于与用户症状直接相关的信息，而不是 general log content. 仅输出最有用的信息，格式要清晰美观。"""
+
+    def __init__(self):
+        # DeepSeek API configuration
+        self.api_key = os.getenv('DEEPSEEK_API_KEY', 'sk-placeholder')  # User should set this
+        self.base_url = "https://api.deepseek.com/v1"
+        self.client = OpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=_HTTP_CLIENT
+        )
+        self.model = "deepseek-chat"
+        
+        # Results for byte-identical prompts, checked first, then for log
+        # windows that only differ in timestamps or ids
+        self._exact_cache = AnalysisCache(maxsize=1000, ttl=1800)
+        self._similar_cache = AnalysisCache(maxsize=512, ttl=1800)
+        
+    def analyze_logs(self, log_text: str, context: Dict = None) -> Dict:
+        """
+        Analyze log text using DeepSeek AI and return insights
+        
+        Args:
+            log_text: The log text to analyze
+            context: Additional context like file type, timestamp range, etc.
+            
+        Returns:
+            Dictionary containing analysis results
+        """
+        log_text, truncated = _fit_log_text(log_text, MAX_LOG_TOKENS)
+        messages = self._analysis_messages(log_text, context)
+        exact_key = self._prompt_key(messages, 0.3, 2000)
+        cached = self._cached_result(self._exact_cache, exact_key, 'exact')
+        if cached is not None:
+            return cached
+        
+        similar_key = make_cache_key('logs', self.model, _normalize_log_text(log_text), context)
+        cached = self._cached_result(self._similar_cache, similar_key, 'similar')
+        if cached is not None:
+            return cached
+        
+        try:
+            # Call DeepSeek API
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=2000
+            )
+            result = self._analysis_result(response, truncated)
+            self._exact_cache.set(exact_key, result)
+            self._similar_cache.set(similar_key, result)
+            return result
+            
+        except Exception as e:
+            return self._error_result(e)
+    
+    def analyze_logs_stream(self, log_text: str, context: Dict = None) -> Iterator[str]:
+        """
+        Analyze log text like analyze_logs, yielding the markdown as it is generated
+        
+        Args:
+            log_text: The log text to analyze
+            context: Additional context like file type, timestamp range, etc.
+            
+        Yields:
+            Successive fragments of the markdown analysis; API errors are raised
+        """
+        log_text, truncated = _fit_log_text(log_text, MAX_LOG_TOKENS)
+        messages = self._analysis_messages(log_text, context)
+        
+        # Same keys as analyze_logs, so streamed and plain analyses share results
+        exact_key = self._prompt_key(messages, 0.3, 2000)
+        similar_key = make_cache_key('logs', self.model, _normalize_log_text(log_text), context)
+        cached = (self._cached_result(self._exact_cache, exact_key, 'exact')
+                  or self._cached_result(self._similar_cache, similar_key, 'similar'))
+        if cached is not None:
+            yield cached["analysis"]
+            return
+        
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=2000,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        parts = []
+        usage = None
+        for chunk in stream:
+            # The final chunk carries the token usage and no choices
+            usage = getattr(chunk, 'usage', None) or usage
+            if chunk.choices:
+                fragment = chunk.choices[0].delta.content
+                if fragment:
+                    parts.append(fragment)
+                    yield fragment
+        
+        # Only a stream that ran to the end is cached
+        result = {
+            "success": True,
+            "analysis": ''.join(parts),
+            "timestamp": _now(),
+            "model": self.model,
+            "log_truncated": truncated
+        }
+        if usage is not None:
+            result["token_usage"] = {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens
+            }
+        self._exact_cache.set(exact_key, result)
+        self._similar_cache.set(similar_key, result)
+    
+    async def analyze_many(self, log_texts: List[str], context: Dict = None, concurrency: int = 10) -> List[Dict]:
+        """
+        Analyze several log texts concurrently, keeping at most `concurrency` API calls in flight
+        
+        Args:
+            log_texts: The log texts to analyze, each as its own request
+            context: Additional context shared by every text
+            concurrency: Maximum number of simultaneous API calls
+            
+        Returns:
+            One analysis result dictionary per text, in input order
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        # Each text goes through analyze_logs on a worker thread, so the fan-out
+        # shares its exact and similar caches and the process-wide connection pool
+        async def analyze_one(log_text):
+            async with semaphore:
+                return await asyncio.to_thread(self.analyze_logs, log_text, context)
+        
+        return await asyncio.gather(*(analyze_one(log_text) for log_text in log_texts))
+    
+    def analyze_logs_many(self, log_texts: List[str], context: Dict = None, concurrency: int = 10) -> List[Dict]:
+        """Blocking wrapper around analyze_many for synchronous callers such as Flask routes"""
+        return asyncio.run(self.analyze_many(log_texts, context, concurrency))
+    
+    def analyze_logs_batch(self, log_texts: List[str], context: Dict = None) -> List[Dict]:
+        """
+        Analyze several log chunks in a single API request
+        
+        The chunks are sent in one user message and the model answers with one
+        "## Chunk i" section per chunk, so the system prompt and round trip are
+        paid once instead of once per chunk.
+        
+        Args:
+            log_texts: The log chunks to analyze, each independently
+            context: Additional context shared by every chunk
+            
+        Returns:
+            One analysis result dictionary per chunk, in input order
+        """
+        if len(log_texts) <= 1:
+            return [self.analyze_logs(log_text, context) for log_text in log_texts]
+        
+        # The chunks share one request, so they share one input budget; at
+        # least a token each, as a zero budget would keep the text whole
+        budget = max(MAX_LOG_TOKENS // len(log_texts), 1)
+        fitted = [_fit_log_text(log_text, budget) for log_text in log_texts]
+        log_texts = [log_text for log_text, _ in fitted]
+        
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self._SYSTEM_PROMPT},
+                    {"role": "user", "content": self._build_batch_user_prompt(log_texts, context)}
+                ],
+                temperature=0.3,
+                max_tokens=min(BATCH_TOKENS_PER_CHUNK * len(log_texts), BATCH_MAX_TOKENS)
+            )
+            content = response.choices[0].message.content or ''
+            token_usage = {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+        except Exception as e:
+            return [self._error_result(e) for _ in log_texts]
+        
+        # Text between one "## Chunk i" header and the next belongs to chunk i
+        headers = list(_CHUNK_HEADER_RE.finditer(content))
+        sections = {}
+        for header, following in zip(headers, headers[1:] + [None]):
+            end = following.start() if following else len(content)
+            sections.setdefault(int(header.group(1)), content[header.end():end].strip())
+        
+        timestamp = _now()
+        results = []
+        for index in range(1, len(log_texts) + 1):
+            analysis = sections.get(index)
+            if not analysis:
+                results.append({
+                    "success": False,
+                    "error": f"No analysis returned for chunk {index}",
+                    "timestamp": timestamp
+                })
+                continue
+            results.append({
+                "success": True,
+                "analysis": analysis,
+                "timestamp": timestamp,
+                "model": self.model,
+                "log_truncated": fitted[index - 1][1],
+                "batch_size": len(log_texts),
+                "token_usage": token_usage  # shared by the whole batch
+            })
+        return results
+    
+    def _analysis_messages(self, log_text: str, context: Dict = None) -> List[Dict]:
+        """Chat messages for a general log analysis request"""
+        return [
+            {"role": "system", "content": self._get_system_prompt()},
+            {"role": "user", "content": self._build_user_prompt(log_text, context)}
+        ]
+    
+    def _analysis_result(self, response, log_truncated: bool = False) -> Dict:
+        """Result dictionary for a completed general analysis"""
+        return {
+            "success": True,
+            "analysis": response.choices[0].message.content,  # Return the markdown text directly
+            "timestamp": _now(),
+            "model": self.model,
+            "log_truncated": log_truncated,
+            "token_usage": {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+        }
+    
+    def cache_stats(self) -> Dict:
+        """Counters of the exact and similar result caches"""
+        return {
+            'exact': self._exact_cache.stats(),
+            'similar': self._similar_cache.stats()
+        }
+    
+    def _prompt_key(self, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        """Digest of everything that is sent to the API for one completion"""
+        parts = [self.model, str(temperature), str(max_tokens)] + [message["content"] for message in messages]
+        return hashlib.blake2b("\x1e".join(parts).encode('utf-8'), digest_size=32).hexdigest()
+    
+    def _cached_result(self, cache: AnalysisCache, key: str, kind: str) -> Optional[Dict]:
+        """A stored result with a fresh timestamp and the cache that answered, or None"""
+        cached = cache.get(key)
+        if cached is None:
+            return None
+        return dict(cached, timestamp=_now(), cache=kind)
+    
+    def _error_result(self, error: Exception) -> Dict:
+        """Result dictionary for a failed API call"""
+        return {
+            "success": False,
+            "error": str(error),
+            "timestamp": _now()
+        }
+    
+    def _get_system_prompt(self) -> str:
+        """Get the system prompt for log analysis"""
+        return self._SYSTEM_PROMPT
+
     def _build_user_prompt(self, log_text: str, context: Dict = None) -> str:
         """Build the user prompt with log text and context"""
-        prompt = f"请分析以下日志条目并以中文Markdown格式返回分析结果。只关注有用信息，避免不必要的输出。\n\n{log_text}\n\n"
+        # Fixed instructions first and the log text last, so consecutive requests
+        # share the longest possible prefix for the provider's prompt cache;
+        # model, temperature and max_tokens stay fixed per request type for the
+        # same reason
+        prompt = "请分析以下日志条目并以中文Markdown格式返回分析结果。只关注有用信息，避免不必要的输出。\n"
+        prompt += "请以中文Markdown格式提供全面的分析，重点关注潜在问题、安全问题和可操作的建议。只输出有用信息，格式要清晰美观。\n\n"
         
-        if context:
-            prompt += "附加上下文:\n"
-            if context.get('file_type'):
-                prompt += f"- 日志类型: {context['file_type']}\n"
-            if context.get('file_name'):
-                prompt += f"- 文件名: {context['file_name']}\n"
-            if context.get('time_range'):
-                prompt += f"- 时间范围: {context['time_range']}\n"
-            if context.get('total_lines'):
-                prompt += f"- 文件总行数: {context['total_lines']}\n"
-            prompt += "\n"
+        prompt += self._build_context_block(context)
         
-        prompt += "请以中文Markdown格式提供全面的分析，重点关注潜在问题、安全问题和可操作的建议。只输出有用信息，格式要清晰美观。"
+        prompt += f"<LOG>\n{log_text}\n</LOG>"
         
         return prompt
 
+    def _build_context_block(self, context: Dict = None) -> str:
+        """Context lines shared by the general and batched analysis prompts"""
+        if not context:
+            return ""
+        block = "附加上下文:\n"
+        if context.get('file_type'):
+            block += f"- 日志类型: {context['file_type']}\n"
+        if context.get('file_name'):
+            block += f"- 文件名: {context['file_name']}\n"
+        if context.get('time_range'):
+            block += f"- 时间范围: {context['time_range']}\n"
+        if context.get('total_lines'):
+            block += f"- 文件总行数: {context['total_lines']}\n"
+        return block + "\n"
+    
+    def _build_batch_user_prompt(self, log_texts: List[str], context: Dict = None) -> str:
+        """Build one user prompt asking for a separately titled analysis of each chunk"""
+        count = len(log_texts)
+        prompt = (f"请分别独立分析以下 {count} 段日志，并以中文Markdown格式返回分析结果。只关注有用信息，避免不必要的输出。\n"
+                  f"请按顺序返回 {count} 个部分，每个部分以单独一行的 \"## Chunk i\" 标题开头（i 为日志段编号，从 1 开始），"
+                  "标题下按系统提示中的结构给出该段日志的分析。\n\n")
+        
+        prompt += self._build_context_block(context)
+        
+        prompt += "\n\n".join(f"Chunk {index}:\n<LOG>\n{log_text}\n</LOG>"
+                               for index, log_text in enumerate(log_texts, 1))
+        
+        return prompt
+    
     def analyze_specific_issue(self, log_text: str, issue_description: str) -> Dict:
         """
         Analyze logs for a specific issue or question
@@ -140,14 +541,8 @@ For each pattern detected:
             Dictionary containing targeted analysis results
         """
         try:
-            system_prompt = """You are a senior operations (运维) and development (研发) expert. Analyze the provided logs to answer a specific question or investigate a particular issue. Provide a focused, actionable response in Chinese in Markdown format. Focus only on useful information and avoid unnecessary output. Do not return results in JSON format."""
-            
-            user_prompt = f"""请分析这些日志以调查以下问题：
-
-问题/问题: {issue_description}
-
-日志条目：
-{log_text}
+            log_text, truncated = _fit_log_text(log_text, MAX_LOG_TOKENS)
+            user_prompt = f"""请分析这些日志以调查下面的问题。
 
 请在中文中提供针对特定问题的集中分析。包括：
 1. 问题是否存在于日志中
@@ -156,31 +551,52 @@ For each pattern detected:
 4. 解决或进一步调查的具体建议
 5. 任何相关的模式或关切
 
-以中文Markdown格式清晰、可操作地格式化您的响应。不要使用JSON格式。只关注有用信息，避免不必要的输出。格式要清晰美观。"""
+以中文Markdown格式清晰、可操作地格式化您的响应。不要使用JSON格式。只关注有用信息，避免不必要的输出。格式要清晰美观。
+
+问题/问题: {issue_description}
 
+<LOG>
+{log_text}
+</LOG>"""
+
+            messages = [
+                {"role": "system", "content": self._ISSUE_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ]
+            exact_key = self._prompt_key(messages, 0.2, 1500)
+            cached = self._cached_result(self._exact_cache, exact_key, 'exact')
+            if cached is not None:
+                return cached
+            
+            similar_key = make_cache_key('issue', self.model, _normalize_log_text(log_text), issue_description)
+            cached = self._cached_result(self._similar_cache, similar_key, 'similar')
+            if cached is not None:
+                return cached
+            
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=messages,
                 temperature=0.2,
                 max_tokens=1500
             )
             
-            return {
+            result = {
                 "success": True,
                 "analysis": response.choices[0].message.content,
                 "issue": issue_description,
-                "timestamp": datetime.utcnow().isoformat(),
-                "model": self.model
+                "timestamp": _now(),
+                "model": self.model,
+                "log_truncated": truncated
             }
+            self._exact_cache.set(exact_key, result)
+            self._similar_cache.set(similar_key, result)
+            return result
             
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": _now()
             }
 
     def get_analysis_suggestions(self, log_entries: List[Dict]) -> List[str]:
@@ -195,10 +611,22 @@ For each pattern detected:
         """
         suggestions = []
         
-        # Analyze log levels
-        error_count = sum(1 for entry in log_entries if entry.get('level') in ['ERROR', 'FATAL', 'CRITICAL'])
-        warning_count = sum(1 for entry in log_entries if entry.get('level') in ['WARN', 'WARNING'])
+        # Count levels, collect sources and gather messages in a single pass
+        error_count = warning_count = 0
+        sources = set()
+        messages = []
+        for entry in log_entries:
+            level = entry.get('level')
+            if level in _ERROR_LEVELS:
+                error_count += 1
+            elif level in _WARNING_LEVELS:
+                warning_count += 1
+            source = entry.get('source')
+            if source:
+                sources.add(source)
+            messages.append(entry.get('message') or '')
         
+        # Analyze log levels
         if error_count > 0:
             suggestions.append(f"Investigate {error_count} error(s) found in the logs")
         
@@ -206,27 +634,24 @@ For each pattern detected:
             suggestions.append(f"Review {warning_count} warning(s) for potential issues")
         
         # Analyze sources/components
-        sources = set(entry.get('source', '') for entry in log_entries if entry.get('source'))
         if len(sources) > 1:
             suggestions.append(f"Analyze interactions between {len(sources)} different components")
         
-        # Look for common patterns
-        messages = [entry.get('message', '') for entry in log_entries]
-        
-        # Check for authentication issues
-        auth_keywords = ['authentication', 'login', 'password', 'unauthorized', 'forbidden']
-        if any(keyword in ' '.join(messages).lower() for keyword in auth_keywords):
-            suggestions.append("Investigate authentication and access control issues")
-        
-        # Check for network issues
-        network_keywords = ['connection', 'timeout', 'network', 'dns', 'socket']
-        if any(keyword in ' '.join(messages).lower() for keyword in network_keywords):
-            suggestions.append("Analyze network connectivity and communication issues")
-        
-        # Check for performance issues
-        perf_keywords = ['slow', 'timeout', 'memory', 'cpu', 'performance', 'latency']
-        if any(keyword in ' '.join(messages).lower() for keyword in perf_keywords):
-            suggestions.append("Review performance and resource utilization issues")
+        # Look for authentication, network and performance issues; blocks of
+        # messages are joined and lowercased, then searched with C-level
+        # substring tests, which beat an alternation regex over the same text.
+        # Only five suggestions are returned, so scanning stops as soon as no
+        # later match could change which categories make the cut
+        slots = 5 - len(suggestions)
+        hits = [False] * len(_SUGGESTION_KEYWORDS)
+        for start in range(0, len(messages), _KEYWORD_SCAN_BLOCK):
+            if _keyword_scan_settled(hits, slots):
+                break
+            text = ' '.join(messages[start:start + _KEYWORD_SCAN_BLOCK]).lower()
+            for index, (keywords, _) in enumerate(_SUGGESTION_KEYWORDS):
+                if not hits[index] and any(keyword in text for keyword in keywords):
+                    hits[index] = True
+        suggestions.extend(suggestion for (_, suggestion), hit in zip(_SUGGESTION_KEYWORDS, hits) if hit)
         
         # Default suggestions if none specific found
         if not suggestions:
@@ -251,17 +676,25 @@ For each pattern detected:
             Dictionary containing analysis results
         """
         try:
+            log_text, truncated = _fit_log_text(log_text, AGENT_MAX_LOG_TOKENS)
+            
             # Prepare the analysis prompt with focus on user symptoms
             system_prompt = self._get_agent_system_prompt()
             user_prompt = self._build_agent_user_prompt(log_text, symptoms, context)
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+            
+            exact_key = self._prompt_key(messages, 0.3, 2500)
+            cached = self._cached_result(self._exact_cache, exact_key, 'exact')
+            if cached is not None:
+                return cached
             
             # Call DeepSeek API
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=messages,
                 temperature=0.3,
                 max_tokens=2500  # Slightly higher for comprehensive analysis
             )
@@ -269,83 +702,47 @@ For each pattern detected:
             # Get the response
             analysis_text = response.choices[0].message.content
             
-            return {
+            result = {
                 "success": True,
                 "analysis": analysis_text,
                 "symptoms": symptoms,
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": _now(),
                 "model": self.model,
+                "log_truncated": truncated,
                 "token_usage": {
                     "prompt_tokens": response.usage.prompt_tokens,
                     "completion_tokens": response.usage.completion_tokens,
                     "total_tokens": response.usage.total_tokens
                 }
             }
+            self._exact_cache.set(exact_key, result)
+            return result
             
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": _now()
             }
     
     def _get_agent_system_prompt(self) -> str:
         """Get the system prompt for agent-based log analysis"""
-        return """You are a senior operations (运维) and development (研发) expert. Analyze the provided log text based on the user's described symptoms to find relevant information, errors, warnings, or patterns that might be related to the reported issue. Focus on actionable insights and avoid unnecessary output.
-
-When analyzing logs with known symptoms:
-
-1. Identify log entries that directly relate to the user's reported symptoms
-2. Look for errors, warnings, or anomalies that occurred around the same time
-3. Find patterns or recurring issues that might explain the problem
-4. Correlate different log entries that might be related
-5. Identify potential root causes based on the log evidence
-6. Provide concrete recommendations for addressing the issue
-7. Highlight the most critical information that needs attention
-
-Provide your analysis in Chinese Markdown format with the following structure:
-# 问题分析
-[Provide a focused overview of the log analysis related to the user's symptoms]
-
-## 相关日志条目
-List the most relevant log entries found:
-- [Timestamp] - [Level] - [Message excerpt]
-- [Include multiple relevant entries]
-
-## 识别的问题
-For each issue found:
-### [Issue Type]
-- **描述**: [Issue description related to symptoms]
-- **严重程度**: [critical|high|medium|low]
-- **时间**: [When it occurred - specific timestamp if available]
-- **建议**: [Specific action to take]
-
-## 根本原因分析
-[Analyze potential root causes based on the log evidence]
-
-## 建议措施
-- [Specific actionable recommendation 1]
-- [Specific actionable recommendation 2]
-- [Specific actionable recommendation 3]
-
-## 时间线
-[If applicable, present a timeline of events related to the issue]
-
-## 关键指标
-- **相关错误数量**: [Number of errors related to symptoms]
-- **相关警告数量**: [Number of warnings related to symptoms]
-- **时间范围**: [Description of time range analyzed]
-
-回答必须使用中文，并以Markdown格式返回，不要使用JSON格式。专注于与用户症状直接相关的信息，而不是 general log content. 仅输出最有用的信息，格式要清晰美观。"""
+        return self._AGENT_SYSTEM_PROMPT
 
     def _build_agent_user_prompt(self, log_text: str, symptoms: str, context: Dict = None) -> str:
         """Build the user prompt for agent-based analysis with symptoms and context"""
-        prompt = f"""请分析以下日志，重点关注与用户描述的症状相关的条目：
+        # Same layout as _build_user_prompt: fixed instructions, then the
+        # per-request details, then the log text
+        prompt = """请分析以下日志，重点关注与用户描述的症状相关的条目。
 
-用户症状: {symptoms}
+请提供中文Markdown格式的详细分析，重点关注与用户症状相关的日志条目。包括：
+1. 与症状直接相关的日志条目
+2. 时间上与问题发生相近的错误或警告
+3. 潜在的根本原因分析
+4. 具体的解决建议
+5. 相关模式或异常
 
-完整日志内容:
-{log_text}
+以中文Markdown格式清楚、有操作性地格式化您的响应。不要使用JSON格式。只关注与用户症状相关的信息，避免一般性描述。格式要清晰美观。
 
 """
         
@@ -361,14 +758,10 @@ For each issue found:
                 prompt += f"- 时间范围: {context['time_range']}\n"
             prompt += "\n"
         
-        prompt += """请提供中文Markdown格式的详细分析，重点关注与用户症状相关的日志条目。包括：
-1. 与症状直接相关的日志条目
-2. 时间上与问题发生相近的错误或警告
-3. 潜在的根本原因分析
-4. 具体的解决建议
-5. 相关模式或异常
-
-以中文Markdown格式清楚、有操作性地格式化您的响应。不要使用JSON格式。只关注与用户症状相关的信息，避免一般性描述。格式要清晰美观。"""
+        prompt += f"用户症状: {symptoms}\n\n<LOG>\n{log_text}\n</LOG>"
         
         return prompt
 
+
+# Shared instance; the OpenAI client is safe to use from several threads
+default_analyzer = AIAnalyzer()
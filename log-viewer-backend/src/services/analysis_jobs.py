@@ -0,0 +1,65 @@
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+
+class AnalysisJobQueue:
+    """Runs AI analysis calls on a background thread pool and tracks them by job id"""
+
+    def __init__(self, max_workers: int = 4, max_jobs: int = 256):
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, app, fn: Callable, *args) -> str:
+        """Queue fn(*args) to run inside an application context; returns the job id"""
+        job_id = uuid.uuid4().hex
+        future = self._executor.submit(self._run, app, fn, *args)
+        with self._lock:
+            self._jobs[job_id] = future
+            self._prune()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Return the job state (and result once finished), or None for an unknown id"""
+        with self._lock:
+            future = self._jobs.get(job_id)
+        if future is None:
+            return None
+
+        if future.running():
+            return {'job_id': job_id, 'state': 'RUNNING'}
+        if not future.done():
+            return {'job_id': job_id, 'state': 'PENDING'}
+
+        error = future.exception()
+        if error is not None:
+            return {'job_id': job_id, 'state': 'FAILURE', 'error': str(error)}
+        return {'job_id': job_id, 'state': 'SUCCESS', 'result': future.result()}
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """Like status, but first block up to timeout seconds for the job to finish"""
+        with self._lock:
+            future = self._jobs.get(job_id)
+        if future is not None:
+            wait([future], timeout=timeout)
+        return self.status(job_id)
+
+    @staticmethod
+    def _run(app, fn, *args):
+        # Each job gets its own app context and therefore its own DB session
+        with app.app_context():
+            return fn(*args)
+
+    def _prune(self):
+        # Drop the oldest finished jobs once the registry is over capacity
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in [job_id for job_id, future in self._jobs.items() if future.done()][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+
+# Shared by all requests in this process
+analysis_jobs = AnalysisJobQueue()
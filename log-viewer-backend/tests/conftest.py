@@ -0,0 +1,33 @@
+import pytest
+from flask import Flask
+
+from src.models.user import db
+from src.models.log import LogFile, LogEntry
+from src.routes.log import log_bp
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.register_blueprint(log_bp, url_prefix='/api/logs')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def log_file(app):
+    log_file = LogFile(filename='app.log', original_filename='app.log',
+                       file_path='/nonexistent/app.log', file_size=0,
+                       log_type='generic', processed=True)
+    db.session.add(log_file)
+    db.session.flush()
+    db.session.add_all(LogEntry(log_file_id=log_file.id, line_number=i,
+                                message=f'line {i}', raw_line=f'line {i}')
+                       for i in range(1, 6))
+    db.session.commit()
+    return log_file
@@ -0,0 +1,164 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import ai_analyzer
+from src.services.ai_analyzer import AIAnalyzer
+
+
+class StubCompletions:
+    """Stands in for client.chat.completions, answering each call with reply(kwargs)"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+        content = self.reply(kwargs)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        )
+
+
+def _stub_analyzer(reply):
+    analyzer = AIAnalyzer()
+    completions = StubCompletions(reply)
+    analyzer.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return analyzer, completions
+
+
+def _log_of(kwargs):
+    prompt = kwargs['messages'][-1]['content']
+    return prompt[prompt.index('<LOG>\n') + 6:prompt.index('\n</LOG>')]
+
+
+def test_analyze_logs_many_keeps_input_order():
+    def reply(kwargs):
+        log = _log_of(kwargs)
+        # Later texts answer first, so order comes from gather, not completion
+        time.sleep(0.01 * (3 - int(log[-1])))
+        return f'analysis of {log}'
+
+    analyzer, completions = _stub_analyzer(reply)
+    results = analyzer.analyze_logs_many(['disk 0', 'disk 1', 'disk 2'], concurrency=3)
+
+    assert [r['analysis'] for r in results] == ['analysis of disk 0', 'analysis of disk 1', 'analysis of disk 2']
+    assert len(completions.calls) == 3
+
+
+def test_analyze_logs_many_shares_the_analysis_caches():
+    analyzer, completions = _stub_analyzer(lambda kwargs: 'ok')
+    analyzer.analyze_logs('disk full')
+
+    results = analyzer.analyze_logs_many(['disk full', '2024-01-01 10:00:00 disk full'])
+
+    assert [r.get('cache') for r in results] == ['exact', None]
+    assert len(completions.calls) == 2
+    assert analyzer.analyze_logs('2024-01-02 11:00:00 disk full')['cache'] == 'similar'
+
+
+def test_analyze_logs_batch_splits_sections_by_chunk_number():
+    # Sections arrive out of order and chunk 2 is missing
+    reply = '## Chunk 3\nthird\n\n## Chunk 1\nfirst\n'
+    analyzer, completions = _stub_analyzer(lambda kwargs: reply)
+
+    results = analyzer.analyze_logs_batch(['a', 'b', 'c'])
+
+    assert len(completions.calls) == 1
+    assert [r['success'] for r in results] == [True, False, True]
+    assert results[0]['analysis'] == 'first'
+    assert results[2]['analysis'] == 'third'
+    assert results[1]['error'] == 'No analysis returned for chunk 2'
+
+
+def test_analyze_logs_batch_reports_malformed_response_per_chunk():
+    analyzer, completions = _stub_analyzer(lambda kwargs: 'x')
+    completions.create = lambda **kwargs: SimpleNamespace(choices=[], usage=None)
+
+    results = analyzer.analyze_logs_batch(['a', 'b'])
+
+    assert [r['success'] for r in results] == [False, False]
+
+
+def test_analyze_logs_batch_truncates_each_chunk_to_its_share(monkeypatch):
+    monkeypatch.setattr(ai_analyzer, '_token_encoding', lambda: None)
+    monkeypatch.setattr(ai_analyzer, 'MAX_LOG_TOKENS', 100)
+    analyzer, completions = _stub_analyzer(lambda kwargs: '## Chunk 1\none\n## Chunk 2\ntwo\n')
+
+    results = analyzer.analyze_logs_batch(['x' * 1000, 'short'])
+
+    assert [r['log_truncated'] for r in results] == [True, False]
+    prompt = completions.calls[0]['messages'][-1]['content']
+    assert 'x' * 101 not in prompt
+
+
+def test_analyze_logs_batch_budget_never_drops_to_zero(monkeypatch):
+    monkeypatch.setattr(ai_analyzer, '_token_encoding', lambda: None)
+    monkeypatch.setattr(ai_analyzer, 'MAX_LOG_TOKENS', 2)
+    analyzer, completions = _stub_analyzer(lambda kwargs: '## Chunk 1\na\n## Chunk 2\nb\n## Chunk 3\nc\n')
+
+    results = analyzer.analyze_logs_batch(['x' * 1000, 'y' * 1000, 'z' * 1000])
+
+    assert [r['log_truncated'] for r in results] == [True, True, True]
+    prompt = completions.calls[0]['messages'][-1]['content']
+    assert 'x' * 100 not in prompt
+
+
+class CharEncoding:
+    """tiktoken stand-in with one token per character"""
+
+    def encode(self, text, disallowed_special=()):
+        return list(text)
+
+    def decode(self, tokens):
+        return ''.join(tokens)
+
+
+def test_fit_log_text_token_path_matches_char_path(monkeypatch):
+    text = 'head ' + 'x' * 500 + ' tail'
+    monkeypatch.setattr(ai_analyzer, '_token_encoding', lambda: None)
+    by_chars = ai_analyzer._fit_log_text(text, 25)
+    monkeypatch.setattr(ai_analyzer, '_token_encoding', lambda: CharEncoding())
+    by_tokens = ai_analyzer._fit_log_text(text, 100)
+
+    # 25 tokens at four characters each is the same 100-character window
+    assert by_tokens == by_chars
+    assert by_tokens[0].startswith('head ') and by_tokens[0].endswith(' tail')
+    assert ai_analyzer._fit_log_text('short', 100) == ('short', False)
+
+
+def test_fit_log_text_token_path_keeps_a_token_per_side(monkeypatch):
+    monkeypatch.setattr(ai_analyzer, '_token_encoding', lambda: CharEncoding())
+
+    assert ai_analyzer._fit_log_text('abcdef', 1) == ('a' + ai_analyzer._TRUNCATION_MARKER + 'f', True)
+
+
+def test_fit_log_text_with_tiktoken_stays_within_budget():
+    pytest.importorskip('tiktoken')
+    ai_analyzer._token_encoding.cache_clear()
+    encoding = ai_analyzer._token_encoding()
+    if encoding is None:
+        pytest.skip('tiktoken encoding file unavailable')
+    text = '2025-09-23 22:40:00 ERROR connection reset by peer\n' * 2000
+
+    fitted, truncated = ai_analyzer._fit_log_text(text, 1000)
+
+    assert truncated
+    marker = len(encoding.encode(ai_analyzer._TRUNCATION_MARKER))
+    assert len(encoding.encode(fitted)) <= 1000 + marker + 2
+    assert ai_analyzer._fit_log_text(text[:200], 1000) == (text[:200], False)
+
+
+def test_shared_http_client_negotiates_http2_with_h2():
+    pytest.importorskip('h2')
+    pool = ai_analyzer._HTTP_CLIENT._transport._pool
+
+    # HTTP/1.1 stays enabled for servers that do not offer h2 over ALPN
+    assert pool._http2 and pool._http1
+    assert AIAnalyzer().client._client is AIAnalyzer().client._client is ai_analyzer._HTTP_CLIENT
@@ -0,0 +1,32 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from src.json_provider import ORJSONProvider
+
+
+VALUES = [
+    {'b': 1, 'a': [1.5, None, True], 'c': {'z': 'x', 'y': -2}},
+    {'timestamp': datetime.datetime(2025, 9, 23, 22, 40, 0)},
+    {'day': datetime.date(2025, 9, 23)},
+    {'id': uuid.UUID(int=1), 'amount': Decimal('1.5')},
+    {'message': 'résumé 日志 "quoted"'},
+    {1: 'non-string key'},
+]
+
+
+@pytest.mark.parametrize('value', VALUES)
+def test_orjson_provider_matches_stdlib_provider(value):
+    pytest.importorskip('orjson')
+    app = Flask(__name__)
+    fast = ORJSONProvider(app).dumps(value)
+    pure = DefaultJSONProvider(app).dumps(value)
+
+    # Same values and the same sorted key order; only whitespace and escaping differ
+    assert json.loads(fast) == json.loads(pure)
+    assert list(json.loads(fast)) == list(json.loads(pure))
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+from src.parsers.log_parser import LogEntry, LogParser
+
+
+def test_timestamp_falls_through_unparsable_leftmost_stamp():
+    parser = LogParser()
+    line = 'Feb 30 12:00:00 host app: retried at 2025-09-23 22:40:00 ERROR failed'
+
+    assert parser.parse_timestamp(line) == datetime(2025, 9, 23, 22, 40, 0)
+
+
+def test_timestamp_none_when_no_stamp_parses():
+    parser = LogParser()
+
+    assert parser.parse_timestamp('Feb 30 12:00:00 host app: failed') is None
+
+
+def test_message_keeps_text_when_timestamp_overlaps_level():
+    parser = LogParser()
+
+    assert parser.parse_line(1, 'app ERROR 5 10:00:00 disk full').message == 'app  disk full'
+    assert parser.parse_line(1, 'INFO 12 12:00:00 something').message == 'something'
+    assert parser.parse_line(1, 'WARN  3 08:15:00 retrying').message == 'retrying'
+
+
+# Lines covering every highlight type, long enough for the RE2 pre-scan
+HIGHLIGHT_LINES = [
+    '2025-09-23 22:40:00.123 ERROR [db-pool] connection to 10.0.0.12 failed after 3 retries, see /var/log/app/db.log',
+    'Sep 23 22:40:00 web01 nginx[1234]: GET https://example.com/api/v1/items?id=42 returned 502 in 1.25s "upstream"',
+    '10.1.2.3 - - [23/Sep/2025:22:40:00 +0000] "GET /index.html HTTP/1.1" 200 5120 "-" "curl/8.0" warning info',
+    '2025-09-23T22:40:00.123456Z pod/api-7f9c namespace/prod kubelet: Back-off restarting failed container, debug',
+    'plain text line without any of the structured tokens we look for, just words words words and more words ok',
+    '2025-09-23 22:40:00 WARN  résumé upload of ２０ files stalled at 50% for user "josé" with "escaped \\" quote"',
+]
+
+
+def test_re2_prescan_matches_pure_re_highlights():
+    pytest.importorskip('re2')
+    fast = LogParser()
+    pure = LogParser()
+    pure._highlight_set = None
+    assert fast._highlight_set is not None
+
+    for i, line in enumerate(HIGHLIGHT_LINES, 1):
+        assert fast.generate_highlights(LogEntry(i, line)) == pure.generate_highlights(LogEntry(i, line))
+
+
+DETECTION_SAMPLES = [
+    ['Sep 23 22:40:00 host sshd[1]: Accepted password for root from 10.0.0.1 port 22'] * 3,
+    ['[    1.234567] usb 1-1: new high-speed USB device number 2 using ehci-pci'] * 3,
+    ['2025-09-23T22:40:00.123Z pod/api-1 namespace/prod kubelet: Started container api'] * 3,
+    ['2025-09-23 22:40:00 0 [Note] InnoDB: mysql query connection established'] * 3,
+    ['10.0.0.1 - - [23/Sep/2025:22:40:00 +0000] "GET / HTTP/1.1" 200 612 "-" "curl/8.0" nginx'] * 3,
+    ['10.0.0.1 - - [23/Sep/2025:22:40:00 +0000] "GET / HTTP/1.1" 200 612 apache httpd'] * 3,
+    ['docker container abc123 started'] * 3,
+    ['ERROR something failed', 'INFO all good', 'WARN careful'],
+    ['just some text', 'and more text'],
+]
+
+
+def test_hyperscan_detection_matches_python_scan():
+    pytest.importorskip('hyperscan')
+    fast = LogParser()
+    pure = LogParser()
+    pure._signature_db = None
+    assert fast._signature_db is not None
+
+    for lines in DETECTION_SAMPLES:
+        assert fast.detect_log_format(lines) == pure.detect_log_format(lines)
@@ -0,0 +1,37 @@
+from sqlalchemy import event
+
+from src.models.user import db
+
+
+def _statements(app, run):
+    seen = []
+    def record(conn, cursor, statement, *args):
+        seen.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return response, seen
+
+
+def test_keyset_page_runs_no_count(app, log_file):
+    client = app.test_client()
+    response, statements = _statements(
+        app, lambda: client.get(f'/api/logs/files/{log_file.id}/entries?after_line=2&per_page=2'))
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert [e['line_number'] for e in body['entries']] == [3, 4]
+    assert body['pagination']['next_after_line'] == 4
+    assert 'entry_count' not in body['file']
+    assert not any('count(' in s.lower() for s in statements)
+
+
+def test_page_number_path_reports_total(app, log_file):
+    response = app.test_client().get(f'/api/logs/files/{log_file.id}/entries?per_page=2')
+
+    body = response.get_json()
+    assert body['pagination']['total'] == 5
+    assert body['pagination']['pages'] == 3
+    assert body['file']['entry_count'] == 5